@@ -0,0 +1,27 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "raw_addresses" ADD "global_id" BIGINT;
+
+        -- Переносим global_id из JSONB в отдельную колонку
+        UPDATE "raw_addresses"
+        SET "global_id" = ("raw_data"->>'global_id')::BIGINT
+        WHERE ("raw_data"->>'global_id') ~ '^[0-9]+$';
+
+        -- Удаляем дубликаты, накопившиеся до появления уникального индекса
+        DELETE FROM "raw_addresses" AS dup
+        USING "raw_addresses" AS kept
+        WHERE dup."global_id" = kept."global_id" AND dup."id" > kept."id";
+
+        CREATE UNIQUE INDEX IF NOT EXISTS "uid_raw_addresses_global_id"
+            ON "raw_addresses" ("global_id");
+    """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "uid_raw_addresses_global_id";
+        ALTER TABLE "raw_addresses" DROP COLUMN "global_id";
+    """
@@ -0,0 +1,15 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        -- Хеш данных реестра для инкрементального обновления домов.
+        -- У существующих домов NULL: первый инкрементальный прогон их перезапишет.
+        ALTER TABLE "houses" ADD "content_hash" VARCHAR(64);
+    """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "houses" DROP COLUMN "content_hash";
+    """
@@ -0,0 +1,29 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE EXTENSION IF NOT EXISTS postgis;
+
+        -- WKT из текстовых колонок переносится в geometry с SRID 4326
+        ALTER TABLE "houses" ALTER COLUMN "geo_data" TYPE geometry(Geometry, 4326)
+            USING ST_GeomFromText(NULLIF("geo_data", ''), 4326);
+        ALTER TABLE "houses" ALTER COLUMN "geodata_center" TYPE geometry(Point, 4326)
+            USING ST_GeomFromText(NULLIF("geodata_center", ''), 4326);
+
+        CREATE INDEX IF NOT EXISTS "idx_houses_geo_data_gist"
+            ON "houses" USING GIST ("geo_data");
+        CREATE INDEX IF NOT EXISTS "idx_houses_geodata_center_gist"
+            ON "houses" USING GIST ("geodata_center");
+    """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_houses_geodata_center_gist";
+        DROP INDEX IF EXISTS "idx_houses_geo_data_gist";
+        ALTER TABLE "houses" ALTER COLUMN "geodata_center" TYPE TEXT
+            USING ST_AsText("geodata_center");
+        ALTER TABLE "houses" ALTER COLUMN "geo_data" TYPE TEXT
+            USING ST_AsText("geo_data");
+    """
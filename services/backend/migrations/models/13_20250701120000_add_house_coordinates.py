@@ -0,0 +1,25 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        -- Координаты центра дома числами, чтобы не разбирать WKT на каждый запрос
+        ALTER TABLE "houses" ADD "latitude" DOUBLE PRECISION;
+        ALTER TABLE "houses" ADD "longitude" DOUBLE PRECISION;
+
+        UPDATE "houses"
+        SET "latitude" = ST_Y("geodata_center"), "longitude" = ST_X("geodata_center")
+        WHERE "geodata_center" IS NOT NULL;
+
+        -- Для числовых фильтров по диапазону координат
+        CREATE INDEX IF NOT EXISTS "idx_houses_latitude_longitude"
+            ON "houses" ("latitude", "longitude");
+    """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_houses_latitude_longitude";
+        ALTER TABLE "houses" DROP COLUMN "longitude";
+        ALTER TABLE "houses" DROP COLUMN "latitude";
+    """
@@ -0,0 +1,17 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        -- MAX(updated_at) для ETag выдачи поиска читается с конца индекса
+        CREATE INDEX IF NOT EXISTS "idx_houses_updated_at" ON "houses" ("updated_at");
+        CREATE INDEX IF NOT EXISTS "idx_house_ratings_updated_at"
+            ON "house_ratings" ("updated_at");
+    """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_house_ratings_updated_at";
+        DROP INDEX IF EXISTS "idx_houses_updated_at";
+    """
@@ -0,0 +1,24 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        -- Фильтры поиска по району/округу и типу объекта, фасеты по ним
+        CREATE INDEX IF NOT EXISTS "idx_houses_district_obj_type"
+            ON "houses" ("district_id", "obj_type");
+        CREATE INDEX IF NOT EXISTS "idx_houses_adm_area_obj_type"
+            ON "houses" ("adm_area_id", "obj_type");
+
+        -- Фильтры has_reviews / min_rating: только дома с опубликованными отзывами
+        CREATE INDEX IF NOT EXISTS "idx_house_ratings_rated"
+            ON "house_ratings" ("house_id") INCLUDE ("rating_sum", "rating_count")
+            WHERE "rating_count" > 0;
+    """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_house_ratings_rated";
+        DROP INDEX IF EXISTS "idx_houses_adm_area_obj_type";
+        DROP INDEX IF EXISTS "idx_houses_district_obj_type";
+    """
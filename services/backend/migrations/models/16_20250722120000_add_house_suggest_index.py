@@ -0,0 +1,16 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        -- Префиксный поиск для /houses/suggest: lower(...) LIKE 'префикс%'
+        -- text_pattern_ops нужен, чтобы LIKE использовал индекс при любой локали
+        CREATE INDEX IF NOT EXISTS "idx_houses_simple_address_prefix"
+            ON "houses" (lower("simple_address") text_pattern_ops);
+    """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_houses_simple_address_prefix";
+    """
@@ -0,0 +1,15 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        -- Версия токенов пользователя: растёт при смене роли и блокировке,
+        -- токены со старой версией перестают приниматься
+        ALTER TABLE "users" ADD "token_version" INT NOT NULL DEFAULT 0;
+    """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        ALTER TABLE "users" DROP COLUMN "token_version";
+    """
@@ -0,0 +1,27 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "refresh_tokens" (
+            "id" UUID NOT NULL  PRIMARY KEY,
+            "token_hash" VARCHAR(64) NOT NULL UNIQUE,
+            "family_id" UUID NOT NULL,
+            "expires_at" TIMESTAMPTZ NOT NULL,
+            "used_at" TIMESTAMPTZ,
+            "revoked" BOOL NOT NULL  DEFAULT False,
+            "created_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+            "user_id" UUID NOT NULL REFERENCES "users" ("id") ON DELETE CASCADE
+        );
+        CREATE INDEX IF NOT EXISTS "idx_refresh_tok_family_id"
+            ON "refresh_tokens" ("family_id");
+        -- Отзыв всех токенов пользователя при блокировке и смене роли
+        CREATE INDEX IF NOT EXISTS "idx_refresh_tok_user_id"
+            ON "refresh_tokens" ("user_id");
+    """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "refresh_tokens";
+    """
@@ -0,0 +1,15 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        -- Удаление истёкших refresh-токенов без полного просмотра таблицы
+        CREATE INDEX IF NOT EXISTS "idx_refresh_tok_expires_at"
+            ON "refresh_tokens" ("expires_at");
+    """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_refresh_tok_expires_at";
+    """
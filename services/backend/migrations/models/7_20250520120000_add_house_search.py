@@ -0,0 +1,27 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        -- Триграммы для поиска по подстроке и с опечатками
+        CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+        -- Нормализованная строка поиска (см. normalize_search_text в models.py)
+        ALTER TABLE "houses" ADD "search_address" TEXT NOT NULL DEFAULT '';
+
+        UPDATE "houses" SET "search_address" = trim(regexp_replace(
+            replace(lower("unom" || ' ' || "full_address" || ' ' || "simple_address"), 'ё', 'е'),
+            '[^[:alnum:]]+', ' ', 'g'
+        ));
+
+        -- GIN-индекс обслуживает и LIKE '%...%', и оператор похожести %
+        CREATE INDEX IF NOT EXISTS "idx_houses_search_address_trgm"
+            ON "houses" USING GIN ("search_address" gin_trgm_ops);
+    """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_houses_search_address_trgm";
+        ALTER TABLE "houses" DROP COLUMN "search_address";
+    """
@@ -0,0 +1,40 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        CREATE TABLE IF NOT EXISTS "house_ratings" (
+            "id" UUID NOT NULL  PRIMARY KEY,
+            "rating_sum" INT NOT NULL  DEFAULT 0,
+            "rating_count" INT NOT NULL  DEFAULT 0,
+            "count_1" INT NOT NULL  DEFAULT 0,
+            "count_2" INT NOT NULL  DEFAULT 0,
+            "count_3" INT NOT NULL  DEFAULT 0,
+            "count_4" INT NOT NULL  DEFAULT 0,
+            "count_5" INT NOT NULL  DEFAULT 0,
+            "updated_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP,
+            "house_id" UUID NOT NULL UNIQUE REFERENCES "houses" ("id") ON DELETE CASCADE
+        );
+
+        -- Первичное заполнение сводок по опубликованным отзывам
+        INSERT INTO "house_ratings" (
+            "id", "house_id", "rating_sum", "rating_count",
+            "count_1", "count_2", "count_3", "count_4", "count_5"
+        )
+        SELECT
+            gen_random_uuid(), "house_id", SUM("rating"), COUNT(*),
+            COUNT(*) FILTER (WHERE "rating" = 1),
+            COUNT(*) FILTER (WHERE "rating" = 2),
+            COUNT(*) FILTER (WHERE "rating" = 3),
+            COUNT(*) FILTER (WHERE "rating" = 4),
+            COUNT(*) FILTER (WHERE "rating" = 5)
+        FROM "reviews"
+        WHERE "is_published" AND NOT "is_deleted"
+        GROUP BY "house_id";
+    """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP TABLE IF EXISTS "house_ratings";
+    """
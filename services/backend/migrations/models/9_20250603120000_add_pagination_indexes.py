@@ -0,0 +1,21 @@
+from tortoise import BaseDBAsyncClient
+
+
+async def upgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        -- Keyset-пагинация /admin/users: ORDER BY created_at, id
+        CREATE INDEX IF NOT EXISTS "idx_users_created_at_id"
+            ON "users" ("created_at", "id");
+
+        -- Keyset-пагинация очереди модерации /admin/pending-reviews
+        CREATE INDEX IF NOT EXISTS "idx_reviews_pending_created_at_id"
+            ON "reviews" ("created_at", "id")
+            WHERE NOT "is_published" AND NOT "is_deleted";
+    """
+
+
+async def downgrade(db: BaseDBAsyncClient) -> str:
+    return """
+        DROP INDEX IF EXISTS "idx_users_created_at_id";
+        DROP INDEX IF EXISTS "idx_reviews_pending_created_at_id";
+    """
@@ -1,21 +1,55 @@
 import os
 from datetime import datetime, timedelta
 from typing import Optional
+from uuid import UUID
 
 from fastapi import Depends, HTTPException, Request
 from fastapi.openapi.models import OAuthFlows as OAuthFlowsModel
 from fastapi.security import OAuth2
 from fastapi.security.utils import get_authorization_scheme_param
 from jose import JWTError, jwt
-from tortoise.exceptions import DoesNotExist
+from pydantic import ValidationError
 
-from src.database.models import User
+from src.cache import Cache, LocalTTLCache
+from src.crud.tokens import revoke_user_refresh_tokens
+from src.crud.users import bump_token_version, get_token_state
 from src.schemas.token import TokenData
-from src.schemas.users import UserOutSchema
+from src.schemas.users import PrincipalSchema
 
 SECRET_KEY = os.environ.get("SECRET_KEY")
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# Токен доступа короткий: его продлевают через /token/refresh без пароля
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.environ.get("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get("REFRESH_TOKEN_EXPIRE_DAYS", 30))
+
+# Роль и блокировка приходят в подписанном токене, из БД нужна только
+# текущая версия токенов пользователя — она кэшируется в памяти процесса.
+# TTL короткий: отзыв из других процессов виден не позже чем через него,
+# в этом процессе блокировка и смена роли сбрасывают запись сразу.
+PRINCIPAL_CACHE_TTL = int(os.environ.get("PRINCIPAL_CACHE_TTL", 30))
+principal_cache = Cache(LocalTTLCache(max_items=10000))
+
+
+async def invalidate_principal(user_id: UUID):
+    await principal_cache.delete("token_state", str(user_id))
+
+
+async def revoke_tokens(user_id: UUID):
+    """Отзывает все выданные пользователю токены (смена роли, блокировка)."""
+    await bump_token_version(user_id)
+    await revoke_user_refresh_tokens(user_id)
+    await invalidate_principal(user_id)
+
+
+def principal_claims(user: PrincipalSchema) -> dict:
+    """Утверждения токена доступа, по которым get_current_user собирает пользователя."""
+    return {
+        "sub": user.username,
+        "uid": str(user.id),
+        "role": user.role_name,
+        "blocked": user.is_blocked,
+        "ver": user.token_version,
+    }
 
 
 class OAuth2PasswordBearerCookie(OAuth2):
@@ -65,7 +99,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(security)):
+async def get_current_user(token: str = Depends(security)) -> PrincipalSchema:
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
@@ -74,18 +108,63 @@ async def get_current_user(token: str = Depends(security)):
 
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
-    except JWTError:
+        token_data = TokenData(
+            username=payload.get("sub"),
+            user_id=payload.get("uid"),
+            role_name=payload.get("role"),
+            is_blocked=payload.get("blocked", False),
+            token_version=payload.get("ver"),
+        )
+    except (JWTError, ValidationError):
         raise credentials_exception
 
-    try:
-        user = await UserOutSchema.from_queryset_single(
-            User.get(username=token_data.username)
-        )
-    except DoesNotExist:
+    # Токены, выданные до появления утверждений о роли, не принимаются
+    if None in (
+        token_data.username,
+        token_data.user_id,
+        token_data.role_name,
+        token_data.token_version,
+    ):
         raise credentials_exception
 
-    return user
+    state = await principal_cache.get_or_set(
+        "token_state",
+        str(token_data.user_id),
+        lambda: get_token_state(token_data.user_id),
+        PRINCIPAL_CACHE_TTL,
+    )
+    # Пользователь удалён или токен отозван сменой роли/блокировкой
+    if state is None or state["token_version"] != token_data.token_version:
+        raise credentials_exception
+    if state["is_blocked"] or token_data.is_blocked:
+        raise HTTPException(status_code=403, detail="User is blocked")
+
+    return PrincipalSchema(
+        id=token_data.user_id,
+        username=token_data.username,
+        is_blocked=token_data.is_blocked,
+        role_name=token_data.role_name,
+        token_version=token_data.token_version,
+    )
+
+
+def require_roles(*roles: str, detail: str = "Access denied"):
+    """
+    Зависимость для маршрутов и роутеров: пропускает пользователей
+    с одной из ролей. Роль берётся из токена, запросов к БД нет.
+    """
+
+    async def check_role(
+        user: PrincipalSchema = Depends(get_current_user),
+    ) -> PrincipalSchema:
+        if user.role_name not in roles:
+            raise HTTPException(status_code=403, detail=detail)
+        return user
+
+    return check_role
+
+
+require_admin = require_roles("Admin", detail="Access denied: Admins only")
+require_not_user = require_roles(
+    "Admin", "Super User", detail="Access denied: Not for users"
+)
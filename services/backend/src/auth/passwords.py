@@ -0,0 +1,142 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+from passlib.hash import argon2
+
+# Схема для новых хешей: bcrypt или argon2 (нужен пакет argon2-cffi).
+# Хеши других схем и другой стоимости считаются устаревшими и
+# перехешируются при следующем успешном входе (verify_and_update).
+PASSWORD_SCHEME = os.environ.get("PASSWORD_SCHEME", "bcrypt")
+# Стоимость подбирается скриптом src/utils/calibrate_passwords.py
+# под бюджет задержки входа на конкретном железе
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+ARGON2_TIME_COST = int(os.environ.get("ARGON2_TIME_COST", 3))
+ARGON2_MEMORY_COST = int(os.environ.get("ARGON2_MEMORY_COST", 65536))  # КиБ
+ARGON2_PARALLELISM = int(os.environ.get("ARGON2_PARALLELISM", 1))
+
+# Потоки для bcrypt: хеширование отпускает GIL, поэтому идёт параллельно,
+# а event loop в это время обслуживает остальные запросы
+PASSWORD_HASH_WORKERS = int(
+    os.environ.get("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1))
+)
+# Сколько операций (выполняемых и ждущих) допускается до ответа 429
+PASSWORD_HASH_QUEUE = int(os.environ.get("PASSWORD_HASH_QUEUE", 32))
+# Через сколько секунд клиенту предлагается повторить запрос
+PASSWORD_RETRY_AFTER = 1
+
+
+class PasswordExecutor:
+    """
+    Ограниченный пул потоков для хеширования и проверки паролей.
+    Если в пуле уже max_pending операций, новая сразу получает 429 —
+    очередь не растёт без предела при всплеске входов.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="password"
+        )
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+
+    async def run(self, func: Callable[..., Any], *args) -> Any:
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=429,
+                detail="Too many password checks in progress, try again later",
+                headers={"Retry-After": str(PASSWORD_RETRY_AFTER)},
+            )
+
+        self.pending += 1
+        queued_at = time.monotonic()
+
+        def timed_call():
+            # Время ожидания свободного потока — основной признак перегрузки.
+            # Счётчики меняются только в event loop, поток лишь замеряет
+            waited = time.monotonic() - queued_at
+            return func(*args), waited
+
+        try:
+            loop = asyncio.get_running_loop()
+            result, waited = await loop.run_in_executor(self._executor, timed_call)
+        finally:
+            self.pending -= 1
+        self.completed += 1
+        self.wait_seconds += waited
+        return result
+
+    def metrics(self) -> dict:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": min(self.pending, self.workers),
+            "queued": max(self.pending - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.wait_seconds * 1000 / (self.completed or 1), 1),
+        }
+
+
+def create_context(
+    scheme: str = PASSWORD_SCHEME,
+    bcrypt_rounds: int = BCRYPT_ROUNDS,
+    argon2_time_cost: int = ARGON2_TIME_COST,
+    argon2_memory_cost: int = ARGON2_MEMORY_COST,
+    argon2_parallelism: int = ARGON2_PARALLELISM,
+) -> CryptContext:
+    """
+    Контекст хеширования паролей. min = max = заданная стоимость:
+    хеш с любой другой стоимостью needs_update и будет обновлён при входе.
+    """
+    if scheme not in ("bcrypt", "argon2"):
+        raise RuntimeError(f"Неизвестная схема паролей: {scheme}")
+    if scheme == "argon2" and not argon2.has_backend():
+        raise RuntimeError("Для PASSWORD_SCHEME=argon2 установите пакет argon2-cffi")
+
+    # Старые bcrypt-хеши проверяются и после перехода на argon2
+    schemes = [scheme] + [name for name in ("bcrypt",) if name != scheme]
+    options = {
+        "bcrypt__default_rounds": bcrypt_rounds,
+        "bcrypt__min_rounds": bcrypt_rounds,
+        "bcrypt__max_rounds": bcrypt_rounds,
+    }
+    if scheme == "argon2":
+        options.update(
+            argon2__time_cost=argon2_time_cost,
+            argon2__memory_cost=argon2_memory_cost,
+            argon2__parallelism=argon2_parallelism,
+        )
+    return CryptContext(schemes=schemes, deprecated="auto", **options)
+
+
+pwd_context = create_context()
+password_executor = PasswordExecutor(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE)
+
+
+async def hash_password(password: str) -> str:
+    return await password_executor.run(pwd_context.hash, password)
+
+
+async def verify_and_update(
+    password: str, hashed_password: str | None
+) -> tuple[bool, str | None]:
+    """
+    Проверяет пароль; вторым элементом — новый хеш, если текущий
+    устарел (другая схема или стоимость), иначе None.
+    """
+    if not hashed_password:
+        return False, None
+    # bcrypt занимает сотни миллисекунд — не в event loop
+    return await password_executor.run(
+        pwd_context.verify_and_update, password, hashed_password
+    )
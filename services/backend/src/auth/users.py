@@ -1,21 +1,12 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from passlib.context import CryptContext
 from tortoise.exceptions import DoesNotExist
 
+from src.auth.passwords import verify_and_update
+from src.crud.users import update_password_hash
 from src.database.models import User
 from src.schemas.users import UserDatabaseSchema
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
 
 async def get_user(username: str):
     return await UserDatabaseSchema.from_queryset_single(User.get(username=username))
@@ -30,11 +21,15 @@ async def validate_user(user: OAuth2PasswordRequestForm = Depends()):
             detail="Incorrect username or password",
         )
 
-    if not verify_password(user.password, db_user.password):
+    verified, new_hash = await verify_and_update(user.password, db_user.password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
         )
+    # Хеш со старой схемой или стоимостью заменяем, пока знаем пароль
+    if new_hash:
+        await update_password_hash(db_user.id, new_hash)
 
     if db_user.is_blocked:
         raise HTTPException(
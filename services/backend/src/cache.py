@@ -0,0 +1,181 @@
+import json
+import os
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import parse_obj_as
+
+try:
+    import redis.asyncio as redis
+except ImportError:  # redis нужен только для CACHE_URL=redis://...
+    redis = None
+
+
+class LocalTTLCache:
+    """
+    Кэш в памяти процесса: LRU на max_items записей, у каждой свой TTL.
+    Версии пространств ключей хранятся отдельно и не вытесняются.
+    У каждого воркера свой экземпляр: сброс (bump_version) виден только
+    в процессе, который его выполнил. При нескольких воркерах нужен CACHE_URL.
+    """
+
+    name = "local"
+    # Значения хранятся как есть, без сериализации
+    serialized = False
+
+    def __init__(self, max_items: int = 10000):
+        self.max_items = max_items
+        self._items: OrderedDict = OrderedDict()
+        self._versions = defaultdict(int)
+
+    async def get(self, key: str) -> Optional[Any]:
+        item = self._items.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: int):
+        self._items[key] = (time.monotonic() + ttl, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._items.pop(key, None)
+
+    async def get_version(self, namespace: str) -> int:
+        return self._versions[namespace]
+
+    async def bump_version(self, namespace: str):
+        self._versions[namespace] += 1
+
+    async def clear(self):
+        self._items.clear()
+        self._versions.clear()
+
+
+class RedisCache:
+    """
+    Кэш в Redis (или совместимом сервере), общий для всех воркеров.
+    client — redis.asyncio.Redis или объект с тем же набором методов.
+    Значения хранятся в JSON: из кэша возвращаются словари и списки,
+    типы восстанавливает Cache.get_or_set по переданной схеме.
+    """
+
+    name = "redis"
+    serialized = True
+
+    def __init__(self, client, prefix: str = "norm-dom:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self.client.get(self.prefix + key)
+        return json.loads(value) if value is not None else None
+
+    async def set(self, key: str, value: Any, ttl: int):
+        data = json.dumps(jsonable_encoder(value), ensure_ascii=False)
+        await self.client.set(self.prefix + key, data, ex=ttl)
+
+    async def delete(self, *keys: str):
+        if keys:
+            await self.client.delete(*(self.prefix + key for key in keys))
+
+    async def get_version(self, namespace: str) -> int:
+        return int(await self.client.get(f"{self.prefix}version:{namespace}") or 0)
+
+    async def bump_version(self, namespace: str):
+        await self.client.incr(f"{self.prefix}version:{namespace}")
+
+    async def clear(self):
+        keys = [key async for key in self.client.scan_iter(f"{self.prefix}*")]
+        if keys:
+            await self.client.delete(*keys)
+
+
+class Cache:
+    """
+    Обёртка над бэкендом: get_or_set по пространствам ключей
+    со счётчиками попаданий и промахов для метрик.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+
+    async def get_or_set(
+        self,
+        namespace: str,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int,
+        schema: Any = None,
+    ) -> Any:
+        """
+        Значение из кэша или результат loader(), который сохраняется на ttl секунд.
+        Ключ включает версию пространства — bump_version сбрасывает его целиком.
+        schema — тип результата loader() (pydantic-схема, List[...] и т.п.):
+        по нему восстанавливается значение, прочитанное из JSON.
+        """
+        version = await self.backend.get_version(namespace)
+        full_key = f"{namespace}:{version}:{key}"
+        value = await self.backend.get(full_key)
+        if value is not None:
+            self.hits[namespace] += 1
+            if schema is not None and self.backend.serialized:
+                value = parse_obj_as(schema, value)
+            return value
+
+        self.misses[namespace] += 1
+        value = await loader()
+        await self.backend.set(full_key, value, ttl)
+        return value
+
+    async def delete(self, namespace: str, *keys: str):
+        version = await self.backend.get_version(namespace)
+        await self.backend.delete(*(f"{namespace}:{version}:{key}" for key in keys))
+
+    async def invalidate(self, namespace: str):
+        await self.backend.bump_version(namespace)
+
+    def metrics(self) -> dict:
+        namespaces = sorted(self.hits.keys() | self.misses.keys())
+        return {
+            "backend": self.backend.name,
+            "namespaces": {
+                namespace: {
+                    "hits": self.hits[namespace],
+                    "misses": self.misses[namespace],
+                    "hit_rate": round(
+                        self.hits[namespace]
+                        / ((self.hits[namespace] + self.misses[namespace]) or 1),
+                        3,
+                    ),
+                }
+                for namespace in namespaces
+            },
+        }
+
+
+def create_backend(url: Optional[str]):
+    """
+    CACHE_URL: не задан или memory:// — кэш в памяти процесса (годится
+    для одного воркера), redis://... — общий кэш в Redis (нужен пакет redis).
+    """
+    if url and url.startswith(("redis://", "rediss://")):
+        if redis is None:
+            raise RuntimeError("Для CACHE_URL=redis:// установите пакет redis")
+        return RedisCache(redis.from_url(url))
+    return LocalTTLCache(int(os.environ.get("CACHE_MAX_ITEMS", 10000)))
+
+
+cache = Cache(create_backend(os.environ.get("CACHE_URL")))
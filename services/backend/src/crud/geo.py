@@ -0,0 +1,272 @@
+import json
+import math
+from collections import defaultdict
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from shapely import wkt
+from shapely.geometry import mapping
+from tortoise import Tortoise
+
+from src.crud.ratings import get_rating_summaries
+from src.database.models import GEO_SRID, House
+
+# (min_lon, min_lat, max_lon, max_lat)
+BBox = Tuple[float, float, float, float]
+# (lat, lon, radius в метрах)
+Circle = Tuple[float, float, float]
+
+EARTH_RADIUS = 6371000
+METERS_PER_DEGREE = 111320
+
+
+def radius_bbox(lat: float, lon: float, radius: float) -> BBox:
+    """Прямоугольник, описанный вокруг круга: для отбора по индексу."""
+    d_lat = radius / METERS_PER_DEGREE
+    d_lon = radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    return lon - d_lon, lat - d_lat, lon + d_lon, lat + d_lat
+
+
+def distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Расстояние по поверхности Земли в метрах (гаверсинус)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(math.sqrt(a))
+
+
+def _area_filter(bbox: BBox, circle: Optional[Circle], params: list) -> str:
+    """
+    WHERE-условие по области. && использует GiST-индекс на geodata_center,
+    для круга дополнительно проверяется точное расстояние по geography.
+    """
+    params.extend(bbox)
+    condition = f'h."geodata_center" && ST_MakeEnvelope($1, $2, $3, $4, {GEO_SRID})'
+    if circle:
+        lat, lon, radius = circle
+        params.extend([lon, lat, radius])
+        condition += (
+            f' AND ST_DWithin(h."geodata_center"::geography, '
+            f"ST_SetSRID(ST_MakePoint($5, $6), {GEO_SRID})::geography, $7)"
+        )
+    return condition
+
+
+async def _houses_in_area(bbox: BBox, circle: Optional[Circle]) -> List[dict]:
+    """
+    Запасной вариант без PostGIS (SQLite в тестах): отбор по числовым
+    колонкам latitude/longitude, расстояние до центра круга — в Python.
+    """
+    min_lon, min_lat, max_lon, max_lat = bbox
+    houses = await House.filter(
+        longitude__gte=min_lon,
+        longitude__lte=max_lon,
+        latitude__gte=min_lat,
+        latitude__lte=max_lat,
+    ).values("id", "unom", "latitude", "longitude")
+    if circle:
+        houses = [
+            house
+            for house in houses
+            if distance(circle[0], circle[1], house["latitude"], house["longitude"])
+            <= circle[2]
+        ]
+    return houses
+
+
+async def get_map_points(
+    bbox: BBox, circle: Optional[Circle], limit: int
+) -> Tuple[List[dict], bool]:
+    """
+    Дома в области как компактные точки (id, unom, координаты, рейтинг).
+    Для круга точки упорядочены по удалённости от центра.
+    Возвращает (точки, обрезан ли результат по limit).
+    """
+    connection = Tortoise.get_connection("default")
+    if connection.capabilities.dialect == "postgres":
+        params = []
+        condition = _area_filter(bbox, circle, params)
+        # KNN-сортировка по GiST-индексу, $5/$6 — центр круга из _area_filter.
+        # Для bbox — по id, чтобы при обрезке по limit набор точек не менялся
+        order = (
+            'ORDER BY h."geodata_center" <-> '
+            f"ST_SetSRID(ST_MakePoint($5, $6), {GEO_SRID})"
+            if circle
+            else 'ORDER BY h."id"'
+        )
+        params.append(limit + 1)
+        rows = await connection.execute_query_dict(
+            f"""
+            SELECT
+                h."id",
+                h."unom",
+                ST_Y(h."geodata_center") AS latitude,
+                ST_X(h."geodata_center") AS longitude,
+                r."rating_sum",
+                r."rating_count"
+            FROM "houses" h
+            LEFT JOIN "house_ratings" r ON r."house_id" = h."id"
+            WHERE {condition}
+            {order}
+            LIMIT ${len(params)}
+            """,
+            params,
+        )
+    else:
+        rows = await _houses_in_area(bbox, circle)
+        if circle:
+            rows.sort(
+                key=lambda row: distance(
+                    circle[0], circle[1], row["latitude"], row["longitude"]
+                )
+            )
+        else:
+            rows.sort(key=lambda row: str(row["id"]))
+        rows = rows[: limit + 1]
+        summaries = await get_rating_summaries([row["id"] for row in rows])
+        for row in rows:
+            summary = summaries.get(row["id"])
+            row["rating_sum"] = summary.rating_sum if summary else 0
+            row["rating_count"] = summary.rating_count if summary else 0
+
+    points = [
+        {
+            "id": row["id"],
+            "unom": row["unom"],
+            "latitude": row["latitude"],
+            "longitude": row["longitude"],
+            "rating": (
+                round(row["rating_sum"] / row["rating_count"], 1)
+                if row["rating_count"]
+                else 0
+            ),
+        }
+        for row in rows[:limit]
+    ]
+    return points, len(rows) > limit
+
+
+async def get_map_clusters(
+    bbox: BBox, circle: Optional[Circle], cell_size: float, limit: int
+) -> Tuple[List[dict], bool]:
+    """
+    Группирует дома области в ячейки сетки cell_size градусов.
+    Координаты кластера — центр масс его точек.
+    """
+    connection = Tortoise.get_connection("default")
+    if connection.capabilities.dialect == "postgres":
+        params = []
+        condition = _area_filter(bbox, circle, params)
+        params += [cell_size, limit + 1]
+        rows = await connection.execute_query_dict(
+            f"""
+            SELECT
+                count(*) AS count,
+                ST_Y(ST_Centroid(ST_Collect(h."geodata_center"))) AS latitude,
+                ST_X(ST_Centroid(ST_Collect(h."geodata_center"))) AS longitude
+            FROM "houses" h
+            WHERE {condition}
+            GROUP BY ST_SnapToGrid(h."geodata_center", ${len(params) - 1})
+            ORDER BY count DESC, latitude, longitude
+            LIMIT ${len(params)}
+            """,
+            params,
+        )
+    else:
+        cells = defaultdict(list)
+        for house in await _houses_in_area(bbox, circle):
+            key = (
+                math.floor(house["longitude"] / cell_size),
+                math.floor(house["latitude"] / cell_size),
+            )
+            cells[key].append(house)
+        rows = [
+            {
+                "count": len(houses),
+                "latitude": sum(h["latitude"] for h in houses) / len(houses),
+                "longitude": sum(h["longitude"] for h in houses) / len(houses),
+            }
+            for houses in cells.values()
+        ]
+        rows.sort(key=lambda row: (-row["count"], row["latitude"], row["longitude"]))
+
+    return rows[:limit], len(rows) > limit
+
+
+async def get_tile(z: int, x: int, y: int, tolerance: float) -> bytes:
+    """
+    Векторный тайл (MVT) с контурами зданий из geo_data: слой "houses"
+    с атрибутами id, unom, rating, rating_count. Контуры упрощаются
+    с допуском tolerance метров (EPSG:3857) — чем мельче масштаб, тем грубее.
+    Без PostGIS (SQLite в тестах) возвращается пустой тайл.
+    """
+    connection = Tortoise.get_connection("default")
+    if connection.capabilities.dialect != "postgres":
+        return b""
+
+    rows = await connection.execute_query_dict(
+        f"""
+        WITH bounds AS (SELECT ST_TileEnvelope($1, $2, $3) AS geom),
+        features AS (
+            SELECT
+                ST_AsMVTGeom(
+                    ST_SimplifyPreserveTopology(ST_Transform(h."geo_data", 3857), $4),
+                    bounds.geom
+                ) AS geom,
+                h."id"::text AS id,
+                h."unom",
+                COALESCE(r."rating_sum"::float8 / NULLIF(r."rating_count", 0), 0)
+                    AS rating,
+                COALESCE(r."rating_count", 0) AS rating_count
+            FROM "houses" h
+            JOIN bounds ON h."geo_data" && ST_Transform(bounds.geom, {GEO_SRID})
+            LEFT JOIN "house_ratings" r ON r."house_id" = h."id"
+        )
+        SELECT ST_AsMVT(features.*, 'houses') AS tile
+        FROM features
+        WHERE geom IS NOT NULL
+        """,
+        [z, x, y, tolerance],
+    )
+    return bytes(rows[0]["tile"] or b"") if rows else b""
+
+
+async def get_house_geometry(house_id: UUID, tolerance: float) -> Optional[dict]:
+    """
+    Контур дома как GeoJSON-геометрия, упрощённый с допуском tolerance
+    градусов (0 — без упрощения). None, если дома нет.
+    """
+    connection = Tortoise.get_connection("default")
+    if connection.capabilities.dialect == "postgres":
+        rows = await connection.execute_query_dict(
+            """
+            SELECT
+                "unom",
+                ST_AsGeoJSON(ST_SimplifyPreserveTopology("geo_data", $2)) AS geometry
+            FROM "houses"
+            WHERE "id" = $1
+            """,
+            [house_id, tolerance],
+        )
+        if not rows:
+            return None
+        geometry = rows[0]["geometry"]
+        return {
+            "unom": rows[0]["unom"],
+            "geometry": json.loads(geometry) if geometry else None,
+        }
+
+    house = await House.filter(id=house_id).first().values("unom", "geo_data")
+    if not house:
+        return None
+    geometry = None
+    if house["geo_data"]:
+        shape = wkt.loads(house["geo_data"])
+        if tolerance:
+            shape = shape.simplify(tolerance, preserve_topology=True)
+        geometry = mapping(shape)
+    return {"unom": house["unom"], "geometry": geometry}
@@ -1,111 +1,346 @@
 import re
-from typing import List
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 
-import tortoise
 from fastapi import HTTPException
-from tortoise.expressions import Q
-from tortoise.functions import Avg
+from tortoise import Tortoise
+from tortoise.expressions import F, Subquery
+from tortoise.functions import Count, Max
+from tortoise.queryset import QuerySet
 
-from src.database.models import House, Review
+from src.crud.ratings import RATING_VALUES, get_rating_summaries
+from src.database.models import House, HouseRating, Photo, Review, normalize_search_text
+from src.helpers import decode_cursor, encode_cursor, keyset_filter
 from src.schemas.houses import HouseOutOneSchema, HouseOutSchema
 
+# Колонки карточки дома без геометрии
+DETAIL_COLUMNS = (
+    "id",
+    "unom",
+    "obj_type",
+    "full_address",
+    "simple_address",
+    "kad_n",
+    "kad_zu",
+    "latitude",
+    "longitude",
+    "created_at",
+    "updated_at",
+)
 
-async def get_house(
-    query: str, page: int = 1, per_page: int = 10
-) -> List[HouseOutSchema]:
-    print(f"[DEBUG] Получен запрос: {query}")
-
-    offset = (page - 1) * per_page
-    houses = (
-        await House.filter(
-            Q(unom__icontains=query)
-            | Q(full_address__icontains=query)
-            | Q(simple_address__icontains=query)
-            | Q(full_address__icontains=query)
+
+def _filter_sql(filters: Optional[dict], params: list) -> Tuple[str, str]:
+    """
+    JOIN и условия WHERE (через AND) для фильтров поиска в Postgres.
+    filters: adm_area_id, district_id, obj_type, min_rating, has_reviews.
+    """
+    filters = filters or {}
+    conditions = []
+    for column in ("adm_area_id", "district_id", "obj_type"):
+        if filters.get(column) is not None:
+            params.append(filters[column])
+            conditions.append(f'h."{column}" = ${len(params)}')
+
+    join = ""
+    if filters.get("min_rating") is not None or filters.get("has_reviews") is not None:
+        join = 'LEFT JOIN "house_ratings" r ON r."house_id" = h."id"'
+    if filters.get("has_reviews") is True:
+        conditions.append('r."rating_count" > 0')
+    elif filters.get("has_reviews") is False:
+        conditions.append('COALESCE(r."rating_count", 0) = 0')
+    if filters.get("min_rating") is not None:
+        params.append(filters["min_rating"])
+        # Средний рейтинг >= min без деления: sum >= count * min.
+        # Явный float8: иначе asyncpg выводит int4 и отбрасывает дробную часть
+        conditions.append(
+            'r."rating_count" > 0 AND '
+            f'r."rating_sum" >= r."rating_count" * ${len(params)}::float8'
+        )
+    return join, "".join(f" AND {condition}" for condition in conditions)
+
+
+def _filter_queryset(houses: QuerySet, filters: Optional[dict]) -> QuerySet:
+    """Те же фильтры поиска для ORM-запроса (SQLite)."""
+    filters = filters or {}
+    for column in ("adm_area_id", "district_id", "obj_type"):
+        if filters.get(column) is not None:
+            houses = houses.filter(**{column: filters[column]})
+
+    rated = HouseRating.filter(rating_count__gt=0)
+    if filters.get("min_rating") is not None:
+        rated = rated.filter(rating_sum__gte=F("rating_count") * filters["min_rating"])
+        houses = houses.filter(id__in=Subquery(rated.values("house_id")))
+    if filters.get("has_reviews") is True:
+        houses = houses.filter(id__in=Subquery(rated.values("house_id")))
+    elif filters.get("has_reviews") is False:
+        houses = houses.exclude(id__in=Subquery(rated.values("house_id")))
+    return houses
+
+
+async def search_house_ids(
+    query: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    filters: Optional[dict] = None,
+) -> Tuple[List[UUID], Optional[str]]:
+    """
+    Возвращает id домов, подходящих под запрос и фильтры, в порядке
+    релевантности, и курсор следующей страницы (None, если страница последняя).
+
+    В Postgres поиск идёт по нормализованной колонке search_address через
+    триграммный GIN-индекс (подстрока + похожесть слов для опечаток).
+    В SQLite (тесты) триграмм нет — используется обычный поиск подстроки.
+    Пагинация keyset: курсор хранит ключ сортировки последней записи.
+    """
+    normalized = normalize_search_text(query)
+    if not normalized:
+        return [], None
+
+    connection = Tortoise.get_connection("default")
+    if connection.capabilities.dialect == "postgres":
+        params = [f"%{normalized}%", normalized, query.strip()]
+        join, conditions = _filter_sql(filters, params)
+        after = ""
+        if cursor:
+            params += decode_cursor(cursor, float, int, UUID)
+            n = len(params)
+            after = f'WHERE (sort_rank, sort_length, "id") > (${n - 2}, ${n - 1}, ${n})'
+        params.append(limit + 1)
+
+        rows = await connection.execute_query_dict(
+            f"""
+            SELECT "id", sort_rank, sort_length FROM (
+                SELECT
+                    h."id",
+                    (-((h."unom" = $3)::int + word_similarity($2, h."search_address")))::float8
+                        AS sort_rank,
+                    length(h."search_address") AS sort_length
+                FROM "houses" h
+                {join}
+                WHERE (h."search_address" LIKE $1 OR $2 <% h."search_address")
+                    {conditions}
+            ) AS ranked
+            {after}
+            ORDER BY sort_rank, sort_length, "id"
+            LIMIT ${len(params)}
+            """,
+            params,
         )
-        .prefetch_related("adm_area", "district", "photos", "reviews")
-        .offset(offset)
-        .limit(per_page)
-        .all()
+        keys = [
+            [row["sort_rank"], row["sort_length"], UUID(str(row["id"]))] for row in rows
+        ]
+    else:
+        houses = _filter_queryset(
+            House.filter(search_address__contains=normalized), filters
+        )
+        if cursor:
+            houses = houses.filter(
+                keyset_filter(
+                    ["simple_address", "id"], decode_cursor(cursor, str, UUID)
+                )
+            )
+        keys = [
+            list(row)
+            for row in await houses.order_by("simple_address", "id")
+            .limit(limit + 1)
+            .values_list("simple_address", "id")
+        ]
+
+    next_cursor = encode_cursor(keys[limit - 1]) if len(keys) > limit else None
+    return [key[-1] for key in keys[:limit]], next_cursor
+
+
+async def get_search_facets(query: str, filters: Optional[dict] = None) -> dict:
+    """
+    Число найденных домов по округам и районам:
+    {"adm_area_id": {id: count}, "district_id": {id: count}}.
+    В Postgres — один агрегирующий запрос с GROUPING SETS.
+    """
+    facets = {"adm_area_id": {}, "district_id": {}}
+    normalized = normalize_search_text(query)
+    if not normalized:
+        return facets
+
+    connection = Tortoise.get_connection("default")
+    if connection.capabilities.dialect == "postgres":
+        params = [f"%{normalized}%", normalized]
+        join, conditions = _filter_sql(filters, params)
+        rows = await connection.execute_query_dict(
+            f"""
+            SELECT
+                h."adm_area_id",
+                h."district_id",
+                GROUPING(h."district_id") AS by_adm_area,
+                count(*) AS count
+            FROM "houses" h
+            {join}
+            WHERE (h."search_address" LIKE $1 OR $2 <% h."search_address")
+                {conditions}
+            GROUP BY GROUPING SETS ((h."adm_area_id"), (h."district_id"))
+            """,
+            params,
+        )
+        for row in rows:
+            column = "adm_area_id" if row["by_adm_area"] else "district_id"
+            facets[column][row[column]] = row["count"]
+        return facets
+
+    houses = _filter_queryset(
+        House.filter(search_address__contains=normalized), filters
     )
+    for column in facets:
+        rows = (
+            await houses.annotate(count=Count("id"))
+            .group_by(column)
+            .values_list(column, "count")
+        )
+        facets[column] = dict(rows)
+    return facets
+
 
-    if not houses:
+async def suggest_houses(prefix: str, limit: int) -> List[dict]:
+    """
+    Дома, чей simple_address начинается с prefix (без учёта регистра):
+    только id и адрес, по алфавиту. В Postgres запрос идёт по индексу
+    lower("simple_address") text_pattern_ops.
+    """
+    prefix = prefix.strip().lower()
+    if not prefix:
+        return []
+
+    connection = Tortoise.get_connection("default")
+    if connection.capabilities.dialect == "postgres":
+        escaped = re.sub(r"([\\%_])", r"\\\1", prefix)
+        return await connection.execute_query_dict(
+            """
+            SELECT "id", "simple_address" FROM "houses"
+            WHERE lower("simple_address") LIKE $1
+            ORDER BY lower("simple_address")
+            LIMIT $2
+            """,
+            [f"{escaped}%", limit],
+        )
+
+    return (
+        await House.filter(simple_address__istartswith=prefix)
+        .order_by("simple_address")
+        .limit(limit)
+        .values("id", "simple_address")
+    )
+
+
+async def get_ratings_for_houses(house_ids: List[UUID]) -> Dict[UUID, dict]:
+    """
+    Средний рейтинг и число опубликованных отзывов для набора домов.
+    Читается из готовых сводок house_ratings одним запросом.
+    """
+    summaries = await get_rating_summaries(house_ids)
+    return {
+        house_id: {
+            "rating": str(round(summary.average, 1)) if summary.rating_count else "0",
+            "rating_count": str(summary.rating_count),
+        }
+        for house_id, summary in summaries.items()
+    }
+
+
+async def get_house(
+    query: str,
+    per_page: int = 10,
+    cursor: Optional[str] = None,
+    filters: Optional[dict] = None,
+) -> Tuple[List[HouseOutSchema], Optional[str]]:
+    house_ids, next_cursor = await search_house_ids(query, per_page, cursor, filters)
+    if not house_ids:
         raise HTTPException(status_code=404, detail="Нет такого дома")
 
-    # Создаём список выходных схем с учётом avg_rating
+    # Только нужные колонки: без геометрии и без полных строк отзывов/фото
+    houses = await House.filter(id__in=house_ids).values(
+        "id",
+        "unom",
+        "full_address",
+        "simple_address",
+        "latitude",
+        "longitude",
+        "created_at",
+        "updated_at",
+        adm_area_name="adm_area__name",
+        district_name="district__name",
+    )
+    # Восстанавливаем порядок релевантности, потерянный при выборке по id
+    position = {house_id: index for index, house_id in enumerate(house_ids)}
+    houses.sort(key=lambda house: position[house["id"]])
+
+    review_ids = defaultdict(list)
+    for house_id, review_id in await Review.filter(house_id__in=house_ids).values_list(
+        "house_id", "id"
+    ):
+        review_ids[house_id].append(review_id)
+
+    ratings = await get_ratings_for_houses(house_ids)
+    empty_rating = {"rating": "0", "rating_count": "0"}
+
     result = []
     for house in houses:
-        published_reviews = await Review.filter(house=house, is_published=True).all()
-        avg_rating = "0"
-        total = "0"
-        if published_reviews:
-            total = sum(review.rating for review in published_reviews)
-            avg_rating = total / len(published_reviews)
-            avg_rating = str(round(avg_rating, 1))
-
-        # Теперь photos и reviews уже загружены через prefetch_related
         data = {
-            "id": house.id,
-            "unom": house.unom,
-            "full_address": house.full_address,
-            "simple_address": house.simple_address,
-            "created_at": house.created_at,
-            "updated_at": house.updated_at,
-            "reviews": [str(review.id) for review in house.reviews],
-            "adm_area": house.adm_area.name if house.adm_area else None,
-            "district": house.district.name if house.district else None,
-            "rating": avg_rating,
-            "rating_count": str(len(published_reviews)),
+            "id": house["id"],
+            "unom": house["unom"],
+            "full_address": house["full_address"],
+            "simple_address": house["simple_address"],
+            "latitude": house["latitude"],
+            "longitude": house["longitude"],
+            "created_at": house["created_at"],
+            "updated_at": house["updated_at"],
+            "reviews": review_ids[house["id"]],
+            "adm_area": house["adm_area_name"],
+            "district": house["district_name"],
+            **ratings.get(house["id"], empty_rating),
         }
         result.append(HouseOutSchema(**data))
 
-    return result
+    return result, next_cursor
+
 
+async def get_house_by_id(
+    house_id: UUID, include_geometry: bool = False
+) -> HouseOutOneSchema:
+    """
+    Карточка дома. Тяжёлые колонки геометрии (geo_data — полный контур)
+    читаются из БД только при include_geometry=True.
+    """
+    columns = list(DETAIL_COLUMNS)
+    if include_geometry:
+        columns += ["geo_data", "geodata_center"]
 
-async def get_house_by_id(house_id: UUID) -> HouseOutOneSchema:
-    # Получаем дом по ID и аннотируем средним рейтингом
-    house = await (
-        House.filter(id=house_id)
-        .prefetch_related("adm_area", "district", "photos", "reviews")
+    house = (
+        await House.filter(id=house_id)
         .first()
+        .values(
+            *columns, adm_area_name="adm_area__name", district_name="district__name"
+        )
     )
 
     if not house:
         raise HTTPException(status_code=404, detail="Дом не найден")
 
-    published_reviews = await Review.filter(house=house, is_published=True).all()
-    avg_rating = "0"
-    total = "0"
-    if published_reviews:
-        total = sum(review.rating for review in published_reviews)
-        avg_rating = total / len(published_reviews)
-        avg_rating = str(round(avg_rating, 1))
-
-    match = re.match(r"POINT \(([\d\.-]+)\s([\d\.-]+)\)", house.geodata_center)
-    if not match:
-        longitude, latitude = None, None
-    longitude, latitude = map(float, match.groups())
+    reviews = await Review.filter(house_id=house_id)
+    # Фото нужны только как id — не тянем base64 содержимое
+    photo_ids = await Photo.filter(house_id=house_id).values_list("id", flat=True)
+    summary = await HouseRating.get_or_none(house_id=house_id) or HouseRating()
 
     data = {
-        "id": house.id,
-        "unom": house.unom,
-        "full_address": house.full_address,
-        "simple_address": house.simple_address,
-        "created_at": house.created_at,
-        "updated_at": house.updated_at,
-        "kad_n": house.kad_n,
-        "kad_zu": house.kad_zu,
-        "geo_data": house.geo_data,
-        "geodata_center": house.geodata_center,
-        "latitude": latitude,
-        "longitude": longitude,
-        "photos": [str(photo.id) for photo in house.photos],
-        "reviews": list(house.reviews),
-        "adm_area": house.adm_area.name if house.adm_area else None,
-        "district": house.district.name if house.district else None,
-        "rating": avg_rating,
-        "rating_count": str(len(published_reviews)),
+        **{column: house[column] for column in columns},
+        "photos": photo_ids,
+        "reviews": reviews,
+        "adm_area": house["adm_area_name"],
+        "district": house["district_name"],
+        "rating": str(round(summary.average, 1)) if summary.rating_count else "0",
+        "rating_count": str(summary.rating_count),
+        "rating_distribution": {
+            str(value): getattr(summary, f"count_{value}") for value in RATING_VALUES
+        },
     }
 
     return HouseOutOneSchema(**data)
@@ -122,14 +357,29 @@ async def calculate_aggregate_rating(house_id: UUID):
     if not house:
         raise HTTPException(status_code=404, detail="Дом не найден")
 
-    reviews = await Review.filter(
-        house_id=house_id, is_published=True, is_deleted=False
-    ).all()
-    total_ratings = sum(review.rating for review in reviews)
-    count = len(reviews)
-
-    if count == 0:
+    summary = await HouseRating.get_or_none(house_id=house_id)
+    if not summary:
         return 0
+    return summary.average
+
+
+async def get_house_version(house_id: UUID) -> Optional[dict]:
+    """
+    Версия данных карточки дома: время изменения дома и сводки рейтинга
+    (она сдвигается при любом изменении отзывов). None, если дома нет.
+    """
+    return (
+        await House.filter(id=house_id)
+        .first()
+        .values("updated_at", rating_updated_at="rating_summary__updated_at")
+    )
+
 
-    aggregate_rating = total_ratings / count
-    return aggregate_rating
+async def get_houses_version() -> Tuple[Optional[datetime], Optional[datetime]]:
+    """
+    Версия данных для выдачи поиска — последние изменения домов и сводок.
+    MAX по индексированным updated_at читает по одной строке индекса.
+    """
+    house = await House.annotate(last=Max("updated_at")).first().values("last")
+    rating = await HouseRating.annotate(last=Max("updated_at")).first().values("last")
+    return (house or {}).get("last"), (rating or {}).get("last")
@@ -0,0 +1,92 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+
+from tortoise.expressions import F
+from tortoise.functions import Count
+from tortoise.timezone import now
+from tortoise.transactions import in_transaction
+
+from src.database.models import HouseRating, Review
+
+RATING_VALUES = range(1, 6)
+
+
+def review_contribution(review: Review) -> Optional[int]:
+    """Оценка, которую отзыв вносит в рейтинг дома, или None, если не учитывается."""
+    if review.is_published and not review.is_deleted:
+        return review.rating
+    return None
+
+
+async def apply_rating_change(
+    house_id: UUID, old_rating: Optional[int], new_rating: Optional[int]
+):
+    """
+    Инкрементально обновляет сводку рейтинга дома.
+    Вызывать внутри той же транзакции, в которой меняется отзыв.
+    updated_at сдвигается при любом изменении отзывов дома, даже если
+    рейтинг не изменился, — по нему строятся ETag/Last-Modified.
+    """
+    await HouseRating.get_or_create(house_id=house_id)
+
+    if old_rating == new_rating:
+        await HouseRating.filter(house_id=house_id).update(updated_at=now())
+        return
+
+    updates = {
+        "rating_sum": F("rating_sum") + (new_rating or 0) - (old_rating or 0),
+        "rating_count": F("rating_count")
+        + (new_rating is not None)
+        - (old_rating is not None),
+        "updated_at": now(),
+    }
+    if old_rating in RATING_VALUES:
+        updates[f"count_{old_rating}"] = F(f"count_{old_rating}") - 1
+    if new_rating in RATING_VALUES:
+        updates[f"count_{new_rating}"] = F(f"count_{new_rating}") + 1
+
+    await HouseRating.filter(house_id=house_id).update(**updates)
+
+
+async def get_rating_summaries(house_ids: List[UUID]) -> Dict[UUID, HouseRating]:
+    summaries = await HouseRating.filter(house_id__in=house_ids)
+    return {summary.house_id: summary for summary in summaries}
+
+
+async def rebuild_house_ratings(
+    house_ids: Optional[Iterable[UUID]] = None, batch_size: int = 1000
+) -> int:
+    """
+    Пересчитывает сводки рейтинга с нуля по опубликованным отзывам.
+    Без house_ids пересобирает все дома. Возвращает число записанных сводок.
+    """
+    filters = {}
+    if house_ids is not None:
+        filters["house_id__in"] = list(house_ids)
+
+    rows = (
+        await Review.filter(is_published=True, is_deleted=False, **filters)
+        .annotate(amount=Count("id"))
+        .group_by("house_id", "rating")
+        .values("house_id", "rating", "amount")
+    )
+
+    totals = defaultdict(HouseRating)
+    # Дома без отзывов получают пустую сводку: её updated_at — версия для ETag
+    for house_id in filters.get("house_id__in", []):
+        totals[house_id].house_id = house_id
+    for row in rows:
+        summary = totals[row["house_id"]]
+        summary.house_id = row["house_id"]
+        summary.rating_sum += row["rating"] * row["amount"]
+        summary.rating_count += row["amount"]
+        if row["rating"] in RATING_VALUES:
+            field = f"count_{row['rating']}"
+            setattr(summary, field, getattr(summary, field) + row["amount"])
+
+    # Querysets создаются внутри транзакции, иначе они возьмут другое соединение
+    async with in_transaction():
+        await HouseRating.filter(**filters).delete()
+        await HouseRating.bulk_create(list(totals.values()), batch_size=batch_size)
+    return len(totals)
@@ -1,12 +1,18 @@
 from uuid import UUID
 
+from tortoise.transactions import in_transaction
+
+from src.crud.ratings import apply_rating_change, review_contribution
 from src.database.models import Review
 
 
 async def create(house, user, rating: int, review_text: str):
-    return await Review.create(
-        house=house, user=user, rating=rating, review_text=review_text
-    )
+    async with in_transaction():
+        review = await Review.create(
+            house=house, user=user, rating=rating, review_text=review_text
+        )
+        await apply_rating_change(review.house_id, None, review_contribution(review))
+    return review
 
 
 async def get_review_by_id(review_id: UUID):
@@ -17,13 +23,24 @@ async def get_reviews_by_user(user):
     return await Review.filter(user=user).prefetch_related("house").all()
 
 
+async def get_reviewed_house_ids(user_id: UUID):
+    return await (
+        Review.filter(user_id=user_id).distinct().values_list("house_id", flat=True)
+    )
+
+
 async def update_review_status(review_id: UUID, is_published: bool, is_deleted: bool):
-    review = await Review.get_or_none(id=review_id)
-    if not review:
-        return None
-    review.is_published = is_published
-    review.is_deleted = is_deleted
-    await review.save()
+    async with in_transaction():
+        review = await Review.filter(id=review_id).select_for_update().first()
+        if not review:
+            return None
+        old_rating = review_contribution(review)
+        review.is_published = is_published
+        review.is_deleted = is_deleted
+        await review.save()
+        await apply_rating_change(
+            review.house_id, old_rating, review_contribution(review)
+        )
     return review
 
 
@@ -34,13 +51,18 @@ async def get_review_by_id_and_user(review_id: UUID, user_id: UUID):
 async def update_review(
     review_id: UUID, new_rating: int, new_content: str, is_published: bool = False
 ):
-    review = await Review.get_or_none(id=review_id)
-    if not review:
-        return None
-
-    review.rating = new_rating
-    review.review_text = new_content
-    review.is_published = is_published
-    await review.save()
+    async with in_transaction():
+        review = await Review.filter(id=review_id).select_for_update().first()
+        if not review:
+            return None
+        old_rating = review_contribution(review)
+
+        review.rating = new_rating
+        review.review_text = new_content
+        review.is_published = is_published
+        await review.save()
+        await apply_rating_change(
+            review.house_id, old_rating, review_contribution(review)
+        )
 
     return review
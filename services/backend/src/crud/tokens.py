@@ -0,0 +1,54 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from tortoise.timezone import now
+
+from src.database.models import RefreshToken
+
+
+async def create_refresh_token(
+    user_id: UUID, token_hash: str, family_id: UUID, expires_at: datetime
+) -> RefreshToken:
+    return await RefreshToken.create(
+        user_id=user_id,
+        token_hash=token_hash,
+        family_id=family_id,
+        expires_at=expires_at,
+    )
+
+
+async def get_refresh_token(token_hash: str) -> RefreshToken | None:
+    return await RefreshToken.get_or_none(token_hash=token_hash)
+
+
+async def mark_refresh_token_used(token_id: UUID) -> int:
+    """
+    Помечает токен обменянным. Условие в UPDATE делает обмен атомарным:
+    из параллельных запросов с одним токеном успешен только один.
+    """
+    return await RefreshToken.filter(
+        id=token_id, used_at__isnull=True, revoked=False, expires_at__gt=now()
+    ).update(used_at=now())
+
+
+async def revoke_refresh_family(family_id: UUID) -> int:
+    return await RefreshToken.filter(family_id=family_id).update(revoked=True)
+
+
+async def revoke_user_refresh_tokens(user_id: UUID) -> int:
+    return await RefreshToken.filter(user_id=user_id, revoked=False).update(
+        revoked=True
+    )
+
+
+async def delete_expired_refresh_tokens(family_id: Optional[UUID] = None) -> int:
+    """
+    Удаляет истёкшие токены (всей таблицы или одной цепочки). Обменянные
+    хранятся до истечения срока: до тех пор их повторное предъявление
+    должно отзывать цепочку, а после — токен недействителен и так.
+    """
+    query = RefreshToken.filter(expires_at__lte=now())
+    if family_id is not None:
+        query = query.filter(family_id=family_id)
+    return await query.delete()
@@ -1,12 +1,10 @@
 from uuid import UUID
 
 from fastapi import HTTPException
-from passlib.context import CryptContext
+from tortoise.expressions import F
 
 from src.database.models import User
-from src.schemas.users import UserFrontSchema
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from src.schemas.users import PrincipalSchema, UserFrontSchema
 
 
 async def get_user(username) -> UserFrontSchema:
@@ -38,3 +36,31 @@ async def create_user_in_db(data: dict):
 
 async def delete_user_by_id(user_id: UUID) -> int:
     return await User.filter(id=user_id).delete()
+
+
+async def get_principal(**filters) -> PrincipalSchema | None:
+    """Пользователь (по username или id) с названием роли одним запросом (JOIN roles)."""
+    user = await User.filter(**filters).select_related("role").first()
+    if not user:
+        return None
+    return PrincipalSchema(
+        id=user.id,
+        username=user.username,
+        full_name=user.full_name,
+        is_blocked=user.is_blocked,
+        role_name=user.role.role_name,
+        token_version=user.token_version,
+    )
+
+
+async def get_token_state(user_id: UUID) -> dict | None:
+    """Текущие версия токенов и блокировка пользователя для проверки токена."""
+    return await User.filter(id=user_id).first().values("token_version", "is_blocked")
+
+
+async def update_password_hash(user_id: UUID, password_hash: str) -> int:
+    return await User.filter(id=user_id).update(password=password_hash)
+
+
+async def bump_token_version(user_id: UUID) -> int:
+    return await User.filter(id=user_id).update(token_version=F("token_version") + 1)
@@ -1,26 +1,76 @@
+import re
 import uuid
 
+from shapely import wkb, wkt
+from shapely.geometry.base import BaseGeometry
 from tortoise import fields, models
 
 
-# Пример простых кастомных полей для работы с геоданными.
-# Здесь они унаследованы от TextField для хранения строкового представления WKT.
-# В реальном проекте следует реализовать полноценную сериализацию/десериализацию.
+def normalize_search_text(value: str) -> str:
+    """
+    Приводит адрес к виду для поиска: нижний регистр, «ё» → «е»,
+    любые знаки препинания и пробелы схлопываются в один пробел.
+    Та же нормализация повторена в SQL миграции 7 для заполнения колонки.
+    """
+    value = (value or "").lower().replace("ё", "е")
+    return re.sub(r"[\W_]+", " ", value).strip()
+
+
+# Геополя: в PostgreSQL хранятся в колонках PostGIS geometry (SRID 4326)
+# с GiST-индексами, в SQLite (тесты) — текстом.
+# В БД пишется EWKT ("SRID=4326;POINT (...)"), наружу модель отдаёт WKT.
+GEO_SRID = 4326
+EWKT_PREFIX = f"SRID={GEO_SRID};"
+
+
 class GeometryField(fields.TextField):
     """Поле для хранения геометрического объекта (например, полигон в формате WKT)."""
 
-    pass
+    class _db_postgres:
+        SQL_TYPE = f"geometry(Geometry, {GEO_SRID})"
+
+    def to_db_value(self, value, instance):
+        if value is None:
+            return None
+        if isinstance(value, BaseGeometry):
+            value = value.wkt
+        if value.startswith("SRID="):
+            return value
+        return EWKT_PREFIX + value
+
+    def to_python_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, BaseGeometry):
+            return value.wkt
+        if value.startswith("SRID="):
+            return value.partition(";")[2]
+        if value[:2] in ("00", "01"):
+            # asyncpg отдаёт geometry текстом — это HEX EWKB
+            return wkb.loads(value, hex=True).wkt
+        return value
+
+
+class PointField(GeometryField):
+    """Поле для хранения точки (например, центральная точка объекта) в формате WKT."""
 
+    class _db_postgres:
+        SQL_TYPE = f"geometry(Point, {GEO_SRID})"
 
-class PointField(fields.TextField):
-    """Поле для хранения точки (например, центральная точка объекта) в формате WKT."""
 
-    pass
+def point_coordinates(point: str | None) -> tuple:
+    """(latitude, longitude) из WKT/EWKT точки или (None, None)."""
+    if not point:
+        return None, None
+    point = wkt.loads(point.partition(";")[2] if point.startswith("SRID=") else point)
+    return point.y, point.x
 
 
 class RawAddress(models.Model):
     id = fields.UUIDField(pk=True, default=uuid.uuid4)  # UUID вместо IntField
     raw_data = fields.JSONField()
+    # Вынесен из raw_data для дедупликации на стороне БД (ON CONFLICT DO NOTHING)
+    global_id = fields.BigIntField(null=True, unique=True)
 
     class Meta:
         table = "raw_addresses"
@@ -72,6 +122,14 @@ class House(models.Model):
 
     geo_data = GeometryField(null=True)
     geodata_center = PointField(null=True)
+    # Координаты центра числами: заполняются из geodata_center при записи
+    latitude = fields.FloatField(null=True)
+    longitude = fields.FloatField(null=True)
+
+    # Нормализованная строка (unom + адреса) под триграммный индекс
+    search_address = fields.TextField(default="")
+    # Хеш данных из реестра для инкрементального обновления (update_houses)
+    content_hash = fields.CharField(max_length=64, null=True)
 
     created_at = fields.DatetimeField(auto_now_add=True)
     updated_at = fields.DatetimeField(auto_now=True)
@@ -82,6 +140,19 @@ class House(models.Model):
     def __str__(self):
         return f"House {self.unom}"
 
+    def build_search_address(self) -> str:
+        return normalize_search_text(
+            f"{self.unom} {self.full_address} {self.simple_address}"
+        )
+
+    def build_coordinates(self):
+        self.latitude, self.longitude = point_coordinates(self.geodata_center)
+
+    async def save(self, *args, **kwargs):
+        self.search_address = self.build_search_address()
+        self.build_coordinates()
+        await super().save(*args, **kwargs)
+
 
 class Role(models.Model):
     id = fields.UUIDField(pk=True, default=uuid.uuid4)
@@ -102,6 +173,8 @@ class User(models.Model):
     password = fields.CharField(max_length=128, null=True)
     role = fields.ForeignKeyField("models.Role", related_name="users", to_field="id")
     is_blocked = fields.BooleanField(default=False)
+    # Входит в токен доступа; увеличивается, чтобы отозвать выданные токены
+    token_version = fields.IntField(default=0)
 
     created_at = fields.DatetimeField(auto_now_add=True)
     modified_at = fields.DatetimeField(auto_now=True)
@@ -113,6 +186,28 @@ class User(models.Model):
         return self.username
 
 
+class RefreshToken(models.Model):
+    """
+    Refresh-токен пользователя. Хранится только SHA-256 от значения.
+    Токены одной цепочки ротации (одного входа) объединены family_id:
+    повторное использование уже обменянного токена отзывает всю цепочку.
+    """
+
+    id = fields.UUIDField(pk=True, default=uuid.uuid4)
+    # related_name=False: токены не попадают в схемы пользователя
+    user = fields.ForeignKeyField("models.User", related_name=False, to_field="id")
+    token_hash = fields.CharField(max_length=64, unique=True)
+    family_id = fields.UUIDField(index=True)
+    expires_at = fields.DatetimeField(index=True)  # для удаления истёкших
+    used_at = fields.DatetimeField(null=True)
+    revoked = fields.BooleanField(default=False)
+
+    created_at = fields.DatetimeField(auto_now_add=True)
+
+    class Meta:
+        table = "refresh_tokens"
+
+
 class Review(models.Model):
     id = fields.UUIDField(pk=True, default=uuid.uuid4)
     house = fields.ForeignKeyField(
@@ -134,6 +229,42 @@ class Review(models.Model):
         return f"Review {self.id} for House {self.house_id} by User {self.user_id}"
 
 
+class HouseRating(models.Model):
+    """
+    Сводка рейтинга дома по опубликованным отзывам.
+    Обновляется инкрементально при публикации/снятии отзыва,
+    пересобирается скриптом src/utils/rebuild_ratings.py.
+    """
+
+    id = fields.UUIDField(pk=True, default=uuid.uuid4)
+    house = fields.OneToOneField(
+        "models.House", related_name="rating_summary", to_field="id"
+    )
+    rating_sum = fields.IntField(default=0)
+    rating_count = fields.IntField(default=0)
+
+    # Распределение оценок 1–5
+    count_1 = fields.IntField(default=0)
+    count_2 = fields.IntField(default=0)
+    count_3 = fields.IntField(default=0)
+    count_4 = fields.IntField(default=0)
+    count_5 = fields.IntField(default=0)
+
+    updated_at = fields.DatetimeField(auto_now=True)
+
+    class Meta:
+        table = "house_ratings"
+
+    def __str__(self):
+        return f"Rating for House {self.house_id}"
+
+    @property
+    def average(self) -> float:
+        if not self.rating_count:
+            return 0
+        return self.rating_sum / self.rating_count
+
+
 class Photo(models.Model):
     id = fields.UUIDField(pk=True, default=uuid.uuid4)
     base64_data = (
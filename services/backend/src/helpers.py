@@ -1,14 +1,34 @@
+import base64
+import hashlib
+import json
 import os
 from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
 
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
 from tortoise import Tortoise
+from tortoise.expressions import Q
+
+# Заголовок ответа с курсором следующей страницы (keyset-пагинация)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
 
 
 @asynccontextmanager
 async def db_connection():
     """
     Контекстный менеджер для управления соединением с базой данных.
+
+    Внутри работающего приложения (фоновые задачи) Tortoise уже
+    инициализирован — используем его пул и ничего не закрываем.
+    Свою инициализацию делаем только при запуске скрипта из консоли.
     """
+    if Tortoise._inited:
+        yield Tortoise
+        return
+
     config = {
         "connections": {
             "default": os.environ.get(
@@ -34,3 +54,106 @@ async def db_connection():
         yield Tortoise
     finally:
         await Tortoise.close_connections()
+
+
+def encode_cursor(values: list) -> str:
+    """
+    Упаковывает ключ сортировки последней записи страницы в непрозрачный курсор.
+    """
+    payload = json.dumps(jsonable_encoder(values), separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _cursor_value(value, kind):
+    """Значение курсора, приведённое к типу поля сортировки."""
+    if kind in (int, float):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise TypeError(value)
+        return kind(value)
+    # Строки, UUID и даты курсор хранит строками (см. encode_cursor)
+    if not isinstance(value, str):
+        raise TypeError(value)
+    if kind is datetime:
+        return datetime.fromisoformat(value)
+    return kind(value)
+
+
+def decode_cursor(cursor: str, *types) -> list:
+    """
+    Распаковывает курсор, выданный encode_cursor, и приводит значения
+    к types (str, int, float, UUID, datetime) — по одному на поле сортировки.
+    Подделанный или испорченный курсор даёт 400, а не ошибку в запросе к БД.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(values)
+        return [_cursor_value(value, kind) for value, kind in zip(values, types)]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Некорректный курсор")
+
+
+def keyset_filter(fields: list, values: list) -> Q:
+    """
+    Условие «строго после (values)» для сортировки по fields по возрастанию:
+    (a > x) OR (a = x AND b > y) OR ...
+    """
+    condition = None
+    for index, field in enumerate(fields):
+        term = Q(**{f"{field}__gt": values[index]})
+        for prev_field, prev_value in zip(fields[:index], values[:index]):
+            term &= Q(**{prev_field: prev_value})
+        condition = term if condition is None else condition | term
+    return condition
+
+
+def as_utc(value: datetime) -> datetime:
+    """Datetime в UTC; наивные значения из БД считаются UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def make_etag(*parts) -> str:
+    """Сильный ETag из версий данных, от которых зависит ответ."""
+    digest = hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: Optional[datetime]
+) -> bool:
+    """
+    Проверяет If-None-Match / If-Modified-Since. If-Modified-Since
+    учитывается только без If-None-Match (RFC 9110).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # В HTTP-дате нет долей секунды
+        return as_utc(last_modified).replace(microsecond=0) <= since
+    return False
+
+
+def set_validators(
+    response: Response,
+    etag: str,
+    last_modified: Optional[datetime],
+    cache_control: str,
+) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    if last_modified:
+        response.headers["Last-Modified"] = format_datetime(
+            as_utc(last_modified), usegmt=True
+        )
+    return response
@@ -6,6 +6,7 @@ from tortoise import Tortoise
 
 from src.database.config import TORTOISE_ORM
 from src.database.register import register_tortoise
+from src.helpers import NEXT_CURSOR_HEADER
 
 # Глобальная настройка логирования
 logging.basicConfig(
@@ -22,7 +23,8 @@ import 'from src.routes import users, notes' must be after 'Tortoise.init_models
 why?
 https://stackoverflow.com/questions/65531387/tortoise-orm-for-python-no-returns-relations-of-entities-pyndantic-fastapi
 """
-from src.routes import admin, houses, super_user, users
+from src.routes import admin, geo, houses, super_user, users
+from src.services.reference import reference_data
 
 app = FastAPI()
 
@@ -39,15 +41,23 @@ app.add_middleware(
     allow_credentials=True,  # <-- Должно быть True, иначе `cookies` не работают
     allow_methods=["*"],  # Разрешаем все методы (GET, POST, OPTIONS и т. д.)
     allow_headers=["*"],  # Разрешаем все заголовки
+    expose_headers=[NEXT_CURSOR_HEADER],  # Курсор пагинации читается фронтендом
 )
 app.include_router(users.router)
 app.include_router(admin.router)
 app.include_router(houses.router)
+app.include_router(geo.router)
 app.include_router(super_user.router)
 
 register_tortoise(app, config=TORTOISE_ORM, generate_schemas=False)
 
 
+@app.on_event("startup")
+async def load_reference_data():
+    # После init_orm из register_tortoise: обработчики вызываются по порядку
+    await reference_data.refresh()
+
+
 @app.get("/")
 def home():
     return "Hello, World!"
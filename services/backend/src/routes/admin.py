@@ -1,36 +1,39 @@
 import os
 import shutil
+from datetime import datetime
+from functools import partial
+from uuid import UUID
 
-from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
 from tortoise.exceptions import DoesNotExist
+from tortoise.functions import Count, Sum
 from tortoise.queryset import QuerySet
 
 import src.utils.download_data as download
 import src.utils.update_houses as update
 import src.utils.upload_data as upload
-from src.auth.jwthandler import get_current_user
-from src.database.models import House, Review, Role, User
+from src.auth.jwthandler import principal_cache, require_admin, revoke_tokens
+from src.auth.passwords import password_executor
+from src.cache import cache
+from src.database.models import House, HouseRating, Review, Role, User
+from src.helpers import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, keyset_filter
+from src.schemas.jobs import JobCreatedSchema, JobOutSchema
 from src.schemas.reviews import (
     ModerateReviewSchema,
     PendingReviewSchema,
     ReviewOutSchema,
 )
 from src.schemas.roles import ChangeRoleSchema
-from src.schemas.users import UserOutAdminSchema, UserOutSchema
+from src.schemas.users import UserOutAdminSchema
+from src.services.jobs import job_runner
 from src.services.reviews import moderate_review
-from src.services.users import is_admin
 
-router = APIRouter()
+# Все маршруты /admin — только для администраторов (роль из токена)
+router = APIRouter(dependencies=[Depends(require_admin)])
 
 
 @router.post("/admin/download")
-async def download_data(
-    file: UploadFile = File(...),
-    current_user: dict = Depends(get_current_user),
-):
-    await is_admin(current_user)
-
+async def download_data(file: UploadFile = File(...)):
     # Define target directory
     target_dir = "src/json/"
     os.makedirs(target_dir, exist_ok=True)
@@ -50,25 +53,35 @@ async def download_data(
         )
 
 
-@router.post("/admin/upload")
-async def upload_data(current_user: UserOutSchema = Depends(get_current_user)):
-    await is_admin(current_user)
-    await upload.main()
-    return JSONResponse(content={"message": "Upload completed"})
+@router.post("/admin/upload", response_model=JobCreatedSchema)
+async def upload_data():
+    job = job_runner.submit("upload", upload.main)
+    return JobCreatedSchema(message="Upload queued", job_id=job.id, status=job.status)
+
+
+@router.post("/admin/update-houses", response_model=JobCreatedSchema)
+async def update_houses(incremental: bool = Query(False)):
+    job = job_runner.submit(
+        "update-houses", partial(update.main, incremental=incremental)
+    )
+    return JobCreatedSchema(message="Update queued", job_id=job.id, status=job.status)
+
+
+@router.get("/admin/jobs", response_model=list[JobOutSchema])
+async def get_jobs():
+    return job_runner.list()
 
 
-@router.post("/admin/update-houses")
-async def update_houses(current_user: UserOutSchema = Depends(get_current_user)):
-    await is_admin(current_user)
-    await update.main()
-    return JSONResponse(content={"message": "Update completed"})
+@router.get("/admin/jobs/{job_id}", response_model=JobOutSchema)
+async def get_job(job_id: UUID):
+    job = job_runner.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job
 
 
 @router.post("/review/moderate", response_model=ReviewOutSchema)
-async def moderate_review_route(
-    data: ModerateReviewSchema, current_user: UserOutSchema = Depends(get_current_user)
-):
-    await is_admin(current_user)
+async def moderate_review_route(data: ModerateReviewSchema):
     try:
         return await moderate_review(data)
     except HTTPException as e:
@@ -78,8 +91,7 @@ async def moderate_review_route(
 
 
 @router.get("/admin/stats")
-async def get_admin_stats(current_user: UserOutSchema = Depends(get_current_user)):
-    await is_admin(current_user)
+async def get_admin_stats():
     try:
         # 1. Последнее обновление данных
         latest_house = await House.all().order_by("-updated_at").first()
@@ -101,15 +113,16 @@ async def get_admin_stats(current_user: UserOutSchema = Depends(get_current_user
             is_published=False, is_deleted=False
         ).count()
 
-        # 6. Средний рейтинг
-        published_reviews = await Review.filter(
-            is_deleted=False, is_published=True
-        ).all()
+        # 6. Средний рейтинг (по сводкам house_ratings)
+        totals = (
+            await HouseRating.all()
+            .annotate(total=Sum("rating_sum"), count=Sum("rating_count"))
+            .first()
+            .values("total", "count")
+        )
         avg_rating = 0
-        total = 0
-        if published_reviews:
-            total = sum(review.rating for review in published_reviews)
-            avg_rating = total / len(published_reviews)
+        if totals and totals["count"]:
+            avg_rating = totals["total"] / totals["count"]
 
         return {
             "last_house_update": latest_time,
@@ -123,18 +136,44 @@ async def get_admin_stats(current_user: UserOutSchema = Depends(get_current_user
         raise e
 
 
-@router.get("/admin/pending-reviews", response_model=list[PendingReviewSchema])
-async def get_pending_reviews(current_user: dict = Depends(get_current_user)):
-    await is_admin(current_user)
+@router.get("/admin/metrics")
+async def get_metrics():
+    # Попадания и промахи кэшей по пространствам ключей, очередь bcrypt
+    return {
+        "cache": cache.metrics(),
+        "principal_cache": principal_cache.metrics(),
+        "password_pool": password_executor.metrics(),
+    }
 
-    # Fetch all unapproved and non-deleted reviews
+
+@router.get("/admin/pending-reviews", response_model=list[PendingReviewSchema])
+async def get_pending_reviews(
+    response: Response,
+    cursor: str | None = Query(None, description="Курсор из X-Next-Cursor"),
+    limit: int = Query(100, ge=1, le=500),
+):
+    # Fetch unapproved and non-deleted reviews, oldest first,
     # and include related user and house data
-    reviews: QuerySet[Review] = Review.filter(
-        is_published=False, is_deleted=False
-    ).prefetch_related("user", "house")
+    reviews: QuerySet[Review] = Review.filter(is_published=False, is_deleted=False)
+    if cursor:
+        created_at, last_id = decode_cursor(cursor, datetime, UUID)
+        reviews = reviews.filter(
+            keyset_filter(["created_at", "id"], [created_at, last_id])
+        )
+    reviews = (
+        reviews.order_by("created_at", "id")
+        .limit(limit + 1)
+        .select_related("user", "house")
+    )
+
+    page = await reviews
+    if len(page) > limit:
+        page = page[:limit]
+        last = page[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([last.created_at, last.id])
 
     result = []
-    async for review in reviews:
+    for review in page:
         result.append(
             PendingReviewSchema(
                 id=str(review.id),
@@ -154,15 +193,15 @@ async def get_pending_reviews(current_user: dict = Depends(get_current_user)):
 
 @router.get("/admin/users", response_model=list[UserOutAdminSchema])
 async def get_users(
-    current_user: dict = Depends(get_current_user),
+    response: Response,
     role: str
     | None = Query(None, description="Filter by role (Admin, Super User, User)"),
     is_blocked: bool | None = Query(None, description="Filter by block status"),
+    cursor: str | None = Query(None, description="Курсор из X-Next-Cursor"),
+    limit: int = Query(100, ge=1, le=500),
 ):
-    await is_admin(current_user)
-
     # Base query
-    users: QuerySet[User] = User.all().prefetch_related("role")
+    users: QuerySet[User] = User.all()
 
     # Apply filters
     if role:
@@ -171,10 +210,28 @@ async def get_users(
     if is_blocked is not None:
         users = users.filter(is_blocked=is_blocked)
 
-    result = []
-    async for user in users:
-        total_reviews = await Review.filter(user=user).all().count()
+    if cursor:
+        created_at, last_id = decode_cursor(cursor, datetime, UUID)
+        users = users.filter(keyset_filter(["created_at", "id"], [created_at, last_id]))
+
+    page = await (
+        users.order_by("created_at", "id").limit(limit + 1).select_related("role")
+    )
+    if len(page) > limit:
+        page = page[:limit]
+        last = page[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([last.created_at, last.id])
+
+    # Количество отзывов для всей страницы одним запросом
+    reviews_count = dict(
+        await Review.filter(user_id__in=[user.id for user in page])
+        .annotate(total=Count("id"))
+        .group_by("user_id")
+        .values_list("user_id", "total")
+    )
 
+    result = []
+    for user in page:
         result.append(
             UserOutAdminSchema(
                 id=str(user.id),
@@ -184,7 +241,7 @@ async def get_users(
                 role_name=user.role.role_name,
                 created_at=user.created_at,
                 is_blocked=user.is_blocked,
-                reviews_count=total_reviews,
+                reviews_count=reviews_count.get(user.id, 0),
             )
         )
 
@@ -192,34 +249,26 @@ async def get_users(
 
 
 @router.post("/admin/users/{user_id}/block")
-async def block_user(
-    user_id: str,
-    current_user: dict = Depends(get_current_user),
-):
-    await is_admin(current_user)
-
+async def block_user(user_id: str):
     user = await User.get_or_none(id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
 
     user.is_blocked = True
     await user.save()
+    await revoke_tokens(user.id)
     return {"status": "blocked", "username": user.username}
 
 
 @router.post("/admin/users/{user_id}/unblock")
-async def unblock_user(
-    user_id: str,
-    current_user: dict = Depends(get_current_user),
-):
-    await is_admin(current_user)
-
+async def unblock_user(user_id: str):
     user = await User.get_or_none(id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
 
     user.is_blocked = False
     await user.save()
+    await revoke_tokens(user.id)
     return {"status": "unblocked", "username": user.username}
 
 
@@ -227,10 +276,7 @@ async def unblock_user(
 async def change_user_role(
     user_id: str,
     data: ChangeRoleSchema,
-    current_user: dict = Depends(get_current_user),
 ):
-    await is_admin(current_user)
-
     try:
         # Get the user by ID
         user = await User.get_or_none(id=user_id)
@@ -245,6 +291,7 @@ async def change_user_role(
         # Update the user's role
         user.role = role
         await user.save()
+        await revoke_tokens(user.id)
 
         return {
             "status": "success",
@@ -0,0 +1,71 @@
+from typing import Optional
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, Query, Request, Response
+
+from src.helpers import is_not_modified, set_validators
+from src.schemas.geo import HouseGeometrySchema, MapOutSchema, MapQuerySchema
+from src.services.geo import (
+    TILE_CACHE_TTL,
+    get_house_geometry_feature,
+    get_house_tile,
+    get_map_houses,
+)
+from src.services.houses import get_house_validators
+
+# Контур меняется только при обновлении реестра
+GEOMETRY_CACHE_CONTROL = "public, max-age=3600"
+
+router = APIRouter()
+
+
+def map_query(
+    bbox: Optional[str] = Query(
+        None,
+        description="min_lon,min_lat,max_lon,max_lat",
+        example="37.5,55.7,37.7,55.8",
+    ),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    radius: Optional[float] = Query(None, description="Радиус в метрах"),
+    zoom: Optional[int] = Query(None, ge=0, le=22),
+    limit: int = Query(1000, ge=1, le=5000),
+) -> MapQuerySchema:
+    return MapQuerySchema(
+        bbox=bbox, lat=lat, lon=lon, radius=radius, zoom=zoom, limit=limit
+    )
+
+
+@router.get("/houses/map", response_model=MapOutSchema)
+async def get_houses_on_map(query: MapQuerySchema = Depends(map_query)):
+    return await get_map_houses(query)
+
+
+@router.get("/tiles/{z}/{x}/{y}.mvt")
+async def get_vector_tile(z: int, x: int, y: int):
+    tile = await get_house_tile(z, x, y)
+    return Response(
+        content=tile,
+        media_type="application/vnd.mapbox-vector-tile",
+        headers={"Cache-Control": f"public, max-age={TILE_CACHE_TTL}"},
+    )
+
+
+@router.get("/house/{id}/geometry", response_model=HouseGeometrySchema)
+async def get_house_geometry(
+    id: UUID,
+    request: Request,
+    response: Response,
+    tolerance: float = Query(
+        0, ge=0, le=0.01, description="Допуск упрощения контура в градусах"
+    ),
+):
+    etag, last_modified = await get_house_validators(id, "geometry", tolerance)
+    if is_not_modified(request, etag, last_modified):
+        return set_validators(
+            Response(status_code=304), etag, last_modified, GEOMETRY_CACHE_CONTROL
+        )
+
+    feature = await get_house_geometry_feature(id, tolerance)
+    set_validators(response, etag, last_modified, GEOMETRY_CACHE_CONTROL)
+    return feature
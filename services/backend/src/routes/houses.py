@@ -1,39 +1,134 @@
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 
 from src.auth.jwthandler import get_current_user
 from src.database.models import AdmArea, District
+from src.helpers import NEXT_CURSOR_HEADER, is_not_modified, set_validators
 from src.schemas.houses import (
     HouseOutOneSchema,
     HouseOutReviewSchema,
     HouseOutSchema,
+    HouseSearchFilters,
+    HouseSuggestSchema,
     ReviewCreateSchema,
+    SearchFacetsSchema,
 )
 from src.schemas.users import UserOutSchema
 from src.services.houses import (
     add_review_to_house_with_logic,
     get_house_by_id_with_logic,
+    get_house_validators,
+    get_search_facets_with_logic,
+    get_search_validators,
     get_searched_houses,
+    get_suggestions,
 )
+from src.services.reference import reference_data
 
 router = APIRouter()
 
+# Клиент может держать ответ без перепроверки max-age секунд,
+# дальше — условный запрос, на который обычно приходит 304
+HOUSE_CACHE_CONTROL = "public, max-age=60"
+SEARCH_CACHE_CONTROL = "public, max-age=30"
+# Справочники меняются только при обновлении реестра
+REFERENCE_CACHE_CONTROL = "public, max-age=3600"
+SUGGEST_CACHE_CONTROL = "public, max-age=300"
+
+
+def search_filters(
+    adm_area: Optional[str] = Query(None, description="Название округа"),
+    district: Optional[str] = Query(None, description="Название района"),
+    obj_type: Optional[str] = Query(None),
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    has_reviews: Optional[bool] = Query(None),
+) -> HouseSearchFilters:
+    return HouseSearchFilters(
+        adm_area=adm_area,
+        district=district,
+        obj_type=obj_type,
+        min_rating=min_rating,
+        has_reviews=has_reviews,
+    )
+
 
 @router.get("/houses/search", response_model=List[HouseOutSchema])
-async def search_houses(query: str):
+async def search_houses(
+    query: str,
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Курсор из X-Next-Cursor"),
+    limit: int = Query(100, ge=1, le=100),
+    filters: HouseSearchFilters = Depends(search_filters),
+):
     try:
-        houses = await get_searched_houses(query)
+        etag, last_modified = await get_search_validators(
+            query, limit, cursor, filters.json()
+        )
+        if is_not_modified(request, etag, last_modified):
+            return set_validators(
+                Response(status_code=304), etag, last_modified, SEARCH_CACHE_CONTROL
+            )
+
+        houses, next_cursor = await get_searched_houses(query, limit, cursor, filters)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        set_validators(response, etag, last_modified, SEARCH_CACHE_CONTROL)
         return houses
     except HTTPException as e:
         raise e
 
 
+@router.get("/houses/suggest", response_model=List[HouseSuggestSchema])
+async def suggest_houses(
+    response: Response,
+    prefix: str = Query(..., min_length=2, max_length=100),
+    limit: int = Query(10, ge=1, le=20),
+):
+    response.headers["Cache-Control"] = SUGGEST_CACHE_CONTROL
+    return await get_suggestions(prefix, limit)
+
+
+@router.get("/houses/search/facets", response_model=SearchFacetsSchema)
+async def search_facets(
+    query: str,
+    request: Request,
+    response: Response,
+    filters: HouseSearchFilters = Depends(search_filters),
+):
+    # Отдельно от /houses/search: ответ поиска остаётся списком домов,
+    # фильтры и кэш у обоих запросов общие
+    etag, last_modified = await get_search_validators(query, "facets", filters.json())
+    if is_not_modified(request, etag, last_modified):
+        return set_validators(
+            Response(status_code=304), etag, last_modified, SEARCH_CACHE_CONTROL
+        )
+
+    facets = await get_search_facets_with_logic(query, filters)
+    set_validators(response, etag, last_modified, SEARCH_CACHE_CONTROL)
+    return facets
+
+
 @router.get("/house/{id}", response_model=HouseOutOneSchema)
-async def get_house_by_id(id: UUID):
+async def get_house_by_id(
+    id: UUID,
+    request: Request,
+    response: Response,
+    include_geometry: bool = Query(
+        False, description="Вернуть geo_data и geodata_center (WKT)"
+    ),
+):
     try:
-        house = await get_house_by_id_with_logic(id)
+        etag, last_modified = await get_house_validators(id, include_geometry)
+        if is_not_modified(request, etag, last_modified):
+            return set_validators(
+                Response(status_code=304), etag, last_modified, HOUSE_CACHE_CONTROL
+            )
+
+        house = await get_house_by_id_with_logic(id, include_geometry)
+        set_validators(response, etag, last_modified, HOUSE_CACHE_CONTROL)
         return house
     except HTTPException as e:
         raise e
@@ -59,14 +154,12 @@ async def add_review_to_house(
 
 
 @router.get("/houses/unique-adm-areas")
-async def get_unique_adm_areas():
-    # Query to get unique adm_areas
-    adm_areas = await AdmArea.all()
-    return {"adm_areas": adm_areas}
+async def get_unique_adm_areas(response: Response):
+    response.headers["Cache-Control"] = REFERENCE_CACHE_CONTROL
+    return {"adm_areas": await reference_data.items(AdmArea)}
 
 
 @router.get("/houses/unique-districts")
-async def get_unique_districts():
-    # Query to get unique districts
-    districts = await District.all()
-    return {"districts": districts}
+async def get_unique_districts(response: Response):
+    response.headers["Cache-Control"] = REFERENCE_CACHE_CONTROL
+    return {"districts": await reference_data.items(District)}
@@ -1,10 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException
 
-from src.auth.jwthandler import get_current_user
+from src.auth.jwthandler import get_current_user, require_not_user
 from src.schemas.reviews import EditReviewSchema, ReviewOutSchema
 from src.schemas.users import UserOutSchema
 from src.services.reviews import edit_review
-from src.services.users import is_not_user
 
 router = APIRouter()
 
@@ -12,15 +11,11 @@ router = APIRouter()
 @router.post(
     "/review/edit",
     response_model=ReviewOutSchema,
-    dependencies=[Depends(get_current_user)],
+    dependencies=[Depends(require_not_user)],
 )
 async def edit_review_route(
     data: EditReviewSchema, current_user: UserOutSchema = Depends(get_current_user)
 ):
-    try:
-        await is_not_user(current_user)
-    except HTTPException as e:
-        raise e
     try:
         return await edit_review(data, current_user.id)
     except HTTPException as e:
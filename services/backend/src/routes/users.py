@@ -1,7 +1,8 @@
 import uuid
 from datetime import timedelta
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Path, status
+from fastapi import APIRouter, Cookie, Depends, HTTPException, Path, Response, status
 from fastapi.encoders import jsonable_encoder
 from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
@@ -9,13 +10,27 @@ from tortoise.contrib.fastapi import HTTPNotFoundError
 
 from src.auth.jwthandler import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
+    REFRESH_TOKEN_EXPIRE_DAYS,
     create_access_token,
     get_current_user,
+    principal_claims,
 )
 from src.auth.users import validate_user
+from src.crud.users import get_principal
+from src.database.models import User
 from src.schemas.reviews import ReviewListResponse
 from src.schemas.token import Status
-from src.schemas.users import UserFrontSchema, UserInSchema, UserOutSchema
+from src.schemas.users import (
+    PrincipalSchema,
+    UserFrontSchema,
+    UserInSchema,
+    UserOutSchema,
+)
+from src.services.tokens import (
+    issue_refresh_token,
+    revoke_refresh_token,
+    rotate_refresh_token,
+)
 from src.services.users import (
     create_user_with_logic,
     delete_user_with_logic,
@@ -36,34 +51,78 @@ async def create_user(user: UserInSchema) -> UserOutSchema:
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
 
 
-@router.post("/login")
-async def login(user: OAuth2PasswordRequestForm = Depends()):
-    user = await validate_user(user)
+# Refresh-токен живёт в отдельной httponly-куке и уходит только на /token/*
+REFRESH_COOKIE = "Refresh"
+REFRESH_COOKIE_PATH = "/token"
 
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect username or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
 
+def set_auth_cookies(
+    response: Response, principal: PrincipalSchema, refresh_token: str
+) -> Response:
+    # Роль и блокировка — в токене: проверки доступа обходятся без БД
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=principal_claims(principal), expires_delta=access_token_expires
     )
     token = jsonable_encoder(access_token)
-    content = {"message": "You've successfully logged in. Welcome back!"}
-    response = JSONResponse(content=content)
     response.set_cookie(
         "Authorization",
         value=f"Bearer {token}",
         httponly=True,
-        max_age=1800,
-        expires=1800,
+        max_age=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        expires=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
         samesite="None",  # <-- Меняем Lax на None
         secure=True,  # <-- Должно быть True, иначе не работает с SameSite=None
     )
+    response.set_cookie(
+        REFRESH_COOKIE,
+        value=refresh_token,
+        httponly=True,
+        max_age=REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60,
+        expires=REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60,
+        path=REFRESH_COOKIE_PATH,
+        samesite="None",
+        secure=True,
+    )
+    return response
+
 
+@router.post("/login")
+async def login(user: OAuth2PasswordRequestForm = Depends()):
+    user = await validate_user(user)
+
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    principal = await get_principal(username=user.username)
+    refresh_token = await issue_refresh_token(principal.id)
+    content = {"message": "You've successfully logged in. Welcome back!"}
+    return set_auth_cookies(JSONResponse(content=content), principal, refresh_token)
+
+
+@router.post("/token/refresh")
+async def refresh_access_token(
+    refresh_token: Optional[str] = Cookie(None, alias=REFRESH_COOKIE)
+):
+    # Без bcrypt: поиск refresh-токена по хешу и новая пара токенов
+    principal, new_refresh_token = await rotate_refresh_token(refresh_token)
+    content = {"message": "Token refreshed"}
+    return set_auth_cookies(JSONResponse(content=content), principal, new_refresh_token)
+
+
+# Под /token: иначе браузер не отправит Refresh-куку
+@router.post("/token/logout")
+async def logout(refresh_token: Optional[str] = Cookie(None, alias=REFRESH_COOKIE)):
+    await revoke_refresh_token(refresh_token)
+    response = JSONResponse(content={"message": "You've successfully logged out"})
+    response.delete_cookie("Authorization", samesite="None", secure=True)
+    response.delete_cookie(
+        REFRESH_COOKIE, path=REFRESH_COOKIE_PATH, samesite="None", secure=True
+    )
     return response
 
 
@@ -74,7 +133,8 @@ async def login(user: OAuth2PasswordRequestForm = Depends()):
 )
 async def read_users_me(current_user: UserOutSchema = Depends(get_current_user)):
     try:
-        return current_user
+        # Полная схема с отзывами и настройками нужна только здесь
+        return await UserOutSchema.from_queryset_single(User.get(id=current_user.id))
     except HTTPException as e:
         raise e
     except Exception as e:
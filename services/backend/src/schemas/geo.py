@@ -0,0 +1,45 @@
+from typing import List, Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class MapQuerySchema(BaseModel):
+    # Область: bbox или круг (lat, lon, radius)
+    bbox: Optional[str] = None  # min_lon,min_lat,max_lon,max_lat
+    lat: Optional[float] = None
+    lon: Optional[float] = None
+    radius: Optional[float] = None  # в метрах
+    zoom: Optional[int] = None
+    limit: int = 1000
+
+
+class MapPointSchema(BaseModel):
+    id: UUID
+    unom: str
+    latitude: float
+    longitude: float
+    rating: float  # 0, если опубликованных отзывов нет
+
+
+class MapClusterSchema(BaseModel):
+    latitude: float
+    longitude: float
+    count: int
+
+
+class MapOutSchema(BaseModel):
+    # На мелких масштабах приходят только кластеры, на крупных — только точки
+    points: List[MapPointSchema] = []
+    clusters: List[MapClusterSchema] = []
+    # True, если в область попало больше объектов, чем limit
+    truncated: bool = False
+
+
+class HouseGeometrySchema(BaseModel):
+    """GeoJSON Feature с контуром дома."""
+
+    type: str = "Feature"
+    id: UUID
+    geometry: Optional[dict] = None  # None, если контура нет
+    properties: dict = {}
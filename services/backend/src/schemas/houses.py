@@ -1,4 +1,4 @@
-from typing import List, Optional
+from typing import Dict, List, Optional
 from uuid import UUID
 
 from pydantic import BaseModel
@@ -22,6 +22,8 @@ HouseOutFrontSchema = pydantic_model_creator(
         "geodata_center",
         "kad_n",
         "kad_zu",
+        "search_address",
+        "content_hash",
         "created_at",
         "updated_at",
     ),
@@ -40,6 +42,9 @@ HouseOut = pydantic_model_creator(
         "district_id",
         "reviews",
         "photos",
+        "rating_summary",
+        "search_address",
+        "content_hash",
     ),
 )
 
@@ -61,14 +66,37 @@ class HouseOutOneSchema(HouseOut):
     rating_count: str
     adm_area: str
     district: str
-    geo_data: str
-    geodata_center: str
-    latitude: str
-    longitude: str
+    # Только при include_geometry=True
+    geo_data: Optional[str] = None
+    geodata_center: Optional[str] = None
+    rating_distribution: Optional[Dict[str, int]] = None
     reviews: Optional[List] = None
     photos: Optional[List[UUID]] = None
 
 
+class HouseSearchFilters(BaseModel):
+    adm_area: Optional[str] = None  # название округа
+    district: Optional[str] = None  # название района
+    obj_type: Optional[str] = None
+    min_rating: Optional[float] = None  # по опубликованным отзывам
+    has_reviews: Optional[bool] = None  # есть ли опубликованные отзывы
+
+
+class HouseSuggestSchema(BaseModel):
+    id: UUID
+    simple_address: str
+
+
+class FacetCountSchema(BaseModel):
+    name: str
+    count: int
+
+
+class SearchFacetsSchema(BaseModel):
+    adm_areas: List[FacetCountSchema] = []
+    districts: List[FacetCountSchema] = []
+
+
 # Схема для хранения данных в базе данных
 HouseDatabaseSchema = pydantic_model_creator(
     House,
@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+
+class JobOutSchema(BaseModel):
+    id: UUID
+    name: str
+    status: str  # "queued", "running", "completed" или "failed"
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # Счётчики, которые сообщает сама задача (processed, inserted, ...)
+    stats: dict = {}
+    # Обработано записей в секунду с момента старта
+    throughput: float = 0
+    error: Optional[str] = None
+
+
+class JobCreatedSchema(BaseModel):
+    message: str
+    job_id: UUID
+    status: str
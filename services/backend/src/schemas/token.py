@@ -1,10 +1,15 @@
 from typing import Optional
+from uuid import UUID
 
 from pydantic import BaseModel
 
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    user_id: Optional[UUID] = None
+    role_name: Optional[str] = None
+    is_blocked: bool = False
+    token_version: Optional[int] = None
 
 
 class Status(BaseModel):
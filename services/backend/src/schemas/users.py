@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Optional
 from uuid import UUID
 
 from pydantic import BaseModel
@@ -14,10 +15,17 @@ UserInSchema = pydantic_model_creator(
 UserOutSchema = pydantic_model_creator(
     User,
     name="UserOut",
-    exclude=["password", "created_at", "modified_at", "email", "role"],
+    exclude=[
+        "password",
+        "created_at",
+        "modified_at",
+        "email",
+        "role",
+        "token_version",
+    ],
 )
 UserDatabaseSchema = pydantic_model_creator(
-    User, name="User", exclude=["created_at", "modified_at"]
+    User, name="User", exclude=["created_at", "modified_at", "token_version"]
 )
 UserOutFrontSchema = pydantic_model_creator(
     User,
@@ -49,3 +57,17 @@ class UserOutAdminSchema(BaseModel):
     created_at: datetime
     is_blocked: bool
     reviews_count: int = 0
+
+
+class PrincipalSchema(BaseModel):
+    """
+    Текущий пользователь для проверок доступа (get_current_user).
+    Собирается из подписанных утверждений токена доступа.
+    """
+
+    id: UUID
+    username: str
+    full_name: Optional[str] = None
+    is_blocked: bool = False
+    role_name: str
+    token_version: int = 0
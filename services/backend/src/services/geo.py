@@ -0,0 +1,144 @@
+import asyncio
+import os
+import shutil
+import threading
+import time
+from typing import Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+
+from src.crud.geo import (
+    get_house_geometry,
+    get_map_clusters,
+    get_map_points,
+    get_tile,
+    radius_bbox,
+)
+from src.schemas.geo import HouseGeometrySchema, MapOutSchema, MapQuerySchema
+
+# Начиная с этого масштаба дома отдаются точками, ниже — кластерами
+CLUSTER_MAX_ZOOM = 15
+# Ячеек кластеризации на ширину тайла 256px (ячейка ~32px)
+CLUSTER_CELLS_PER_TILE = 8
+# Максимальный радиус поиска вокруг точки, м
+MAX_RADIUS = 50000
+
+# Контуры зданий в тайлах отдаются начиная с этого масштаба
+TILE_MIN_ZOOM = 12
+TILE_MAX_ZOOM = 22
+# Ширина мира в EPSG:3857, м — для допуска упрощения на масштабе
+WORLD_SIZE = 40075016.68
+TILE_CACHE_DIR = os.environ.get("TILE_CACHE_DIR", "src/tiles/")
+# Рейтинги в тайлах обновляются не реже этого срока, с
+TILE_CACHE_TTL = int(os.environ.get("TILE_CACHE_TTL", 3600))
+
+
+def parse_bbox(bbox: str):
+    try:
+        min_lon, min_lat, max_lon, max_lat = map(float, bbox.split(","))
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="bbox должен быть в формате min_lon,min_lat,max_lon,max_lat",
+        )
+    if not (-180 <= min_lon <= max_lon <= 180 and -90 <= min_lat <= max_lat <= 90):
+        raise HTTPException(status_code=400, detail="Некорректные границы bbox")
+    return min_lon, min_lat, max_lon, max_lat
+
+
+async def get_map_houses(query: MapQuerySchema) -> MapOutSchema:
+    """
+    Дома для карты: в прямоугольнике bbox или в радиусе radius метров
+    от точки (lat, lon). При zoom < CLUSTER_MAX_ZOOM вместо точек
+    возвращаются кластеры по сетке, размер ячейки зависит от масштаба.
+    """
+    circle = None
+    if query.bbox:
+        area = parse_bbox(query.bbox)
+    elif None not in (query.lat, query.lon, query.radius):
+        lat, lon, radius = query.lat, query.lon, query.radius
+        if not 0 < radius <= MAX_RADIUS:
+            raise HTTPException(
+                status_code=400, detail=f"radius должен быть от 0 до {MAX_RADIUS} м"
+            )
+        circle = (lat, lon, radius)
+        area = radius_bbox(lat, lon, radius)
+    else:
+        raise HTTPException(
+            status_code=400, detail="Нужно указать bbox или lat, lon и radius"
+        )
+
+    if query.zoom is not None and query.zoom < CLUSTER_MAX_ZOOM:
+        cell_size = 360 / 2**query.zoom / CLUSTER_CELLS_PER_TILE
+        clusters, truncated = await get_map_clusters(
+            area, circle, cell_size, query.limit
+        )
+        return MapOutSchema(clusters=clusters, truncated=truncated)
+
+    points, truncated = await get_map_points(area, circle, query.limit)
+    return MapOutSchema(points=points, truncated=truncated)
+
+
+async def get_house_geometry_feature(
+    house_id: UUID, tolerance: float = 0
+) -> HouseGeometrySchema:
+    house = await get_house_geometry(house_id, tolerance)
+    if not house:
+        raise HTTPException(status_code=404, detail="Дом не найден")
+    return HouseGeometrySchema(
+        id=house_id, geometry=house["geometry"], properties={"unom": house["unom"]}
+    )
+
+
+def tile_path(z: int, x: int, y: int) -> str:
+    return os.path.join(TILE_CACHE_DIR, str(z), str(x), f"{y}.mvt")
+
+
+def clear_tile_cache():
+    """Сбрасывает кэш тайлов — вызывается после обновления домов."""
+    shutil.rmtree(TILE_CACHE_DIR, ignore_errors=True)
+
+
+async def get_house_tile(z: int, x: int, y: int) -> bytes:
+    """
+    Тайл с контурами зданий. Готовые тайлы кэшируются на диске
+    (TILE_CACHE_DIR/z/x/y.mvt) на TILE_CACHE_TTL секунд.
+    """
+    if not (0 <= z <= TILE_MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z):
+        raise HTTPException(status_code=400, detail="Некорректные координаты тайла")
+    if z < TILE_MIN_ZOOM:
+        return b""
+
+    # Работа с диском — в пуле потоков, чтобы не блокировать event loop
+    loop = asyncio.get_running_loop()
+    path = tile_path(z, x, y)
+    tile = await loop.run_in_executor(None, read_cached_tile, path)
+    if tile is not None:
+        return tile
+
+    # Допуск упрощения — один пиксель тайла 256px на этом масштабе
+    tile = await get_tile(z, x, y, WORLD_SIZE / (256 * 2**z))
+    await loop.run_in_executor(None, write_cached_tile, path, tile)
+    return tile
+
+
+def read_cached_tile(path: str) -> Optional[bytes]:
+    """Тайл из кэша на диске или None, если его нет или он устарел."""
+    try:
+        if time.time() - os.path.getmtime(path) < TILE_CACHE_TTL:
+            with open(path, "rb") as file:
+                return file.read()
+    except OSError:
+        pass
+    return None
+
+
+def write_cached_tile(path: str, tile: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Запись через временный файл, чтобы параллельный запрос не прочитал половину;
+    # в имени и поток: один тайл могут записывать несколько потоков пула
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(tile)
+    os.replace(tmp_path, path)
@@ -1,4 +1,7 @@
-from typing import List
+import hashlib
+import os
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
 from uuid import UUID
 
 from fastapi import HTTPException
@@ -6,10 +9,82 @@ from tortoise.exceptions import IntegrityError
 
 import src.crud.reviews as crud_reviews
 import src.crud.users as crud_user
-from src.crud.houses import get_house, get_house_by_id, get_or_none
+from src.cache import cache
+from src.crud.houses import (
+    get_house,
+    get_house_by_id,
+    get_house_version,
+    get_houses_version,
+    get_or_none,
+    get_search_facets,
+    suggest_houses,
+)
+from src.database.models import AdmArea, District
+from src.helpers import make_etag
 from src.main import logger
-from src.schemas.houses import HouseOutOneSchema, HouseOutReviewSchema, HouseOutSchema
+from src.schemas.houses import (
+    FacetCountSchema,
+    HouseOutOneSchema,
+    HouseOutReviewSchema,
+    HouseOutSchema,
+    HouseSearchFilters,
+    HouseSuggestSchema,
+    SearchFacetsSchema,
+)
 from src.schemas.users import UserOutSchema
+from src.services.reference import reference_data
+
+# Сколько секунд живут закэшированные карточки домов и результаты поиска
+HOUSE_CACHE_TTL = int(os.environ.get("HOUSE_CACHE_TTL", 300))
+
+
+def search_cache_key(*parts) -> str:
+    raw = "\0".join("" if part is None else str(part) for part in parts)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+async def invalidate_house_cache(house_ids: Iterable[UUID]):
+    """
+    Сбрасывает кэш карточек домов и весь кэш поиска: рейтинг в выдаче
+    поиска мог измениться. Вызывается при изменении отзывов.
+    """
+    keys = [
+        f"{house_id}:{int(geometry)}" for house_id in house_ids for geometry in (0, 1)
+    ]
+    await cache.delete("house", *keys)
+    await cache.invalidate("search")
+
+
+async def invalidate_all_house_cache():
+    """Полный сброс после обновления домов из реестра."""
+    await cache.invalidate("house")
+    await cache.invalidate("search")
+    await cache.invalidate("suggest")
+
+
+async def get_house_validators(
+    house_id: UUID, *variant
+) -> Tuple[str, Optional[datetime]]:
+    """
+    ETag и Last-Modified карточки дома по одному лёгкому запросу версий.
+    variant — параметры, меняющие представление (например, include_geometry).
+    """
+    version = await get_house_version(house_id)
+    if not version:
+        raise HTTPException(status_code=404, detail="Дом не найден")
+    updated_at, rating_updated_at = version["updated_at"], version["rating_updated_at"]
+    etag = make_etag("house", house_id, updated_at, rating_updated_at, *variant)
+    return etag, max(filter(None, (updated_at, rating_updated_at)))
+
+
+async def get_search_validators(query: str, *variant) -> Tuple[str, Optional[datetime]]:
+    """
+    ETag и Last-Modified выдачи поиска: меняются при любом изменении домов.
+    variant — остальные параметры запроса (страница, курсор, фильтры).
+    """
+    house_last, rating_last = await get_houses_version()
+    etag = make_etag("search", query, *variant, house_last, rating_last)
+    return etag, max(filter(None, (house_last, rating_last)), default=None)
 
 
 async def add_review_to_house_with_logic(
@@ -34,6 +109,7 @@ async def add_review_to_house_with_logic(
         raise HTTPException(status_code=400, detail=str(err))
 
     logger.info(f"Review data: {review}")
+    await invalidate_house_cache([house.id])
 
     # Обновляем дом с новым списком отзывов
     await house.fetch_related("reviews")  # Получаем связанные отзывы
@@ -42,24 +118,121 @@ async def add_review_to_house_with_logic(
     )  # Возвращаем обновленный дом
 
 
-async def get_searched_houses(
-    query: str, page: int = 1, per_page: int = 100
-) -> List[HouseOutSchema]:
-    houses = await get_house(query, page, per_page)
+async def resolve_search_filters(filters: Optional[HouseSearchFilters]):
+    """
+    Переводит названия округа/района в id по справочникам в памяти.
+    Возвращает None, если такого округа или района нет — искать нечего.
+    """
+    if filters is None:
+        return {}
+    resolved = {
+        "obj_type": filters.obj_type,
+        "min_rating": filters.min_rating,
+        "has_reviews": filters.has_reviews,
+    }
+    for model, name, column in (
+        (AdmArea, filters.adm_area, "adm_area_id"),
+        (District, filters.district, "district_id"),
+    ):
+        if name is not None:
+            resolved[column] = (await reference_data.name_map(model)).get(name)
+            if resolved[column] is None:
+                return None
+    return resolved
 
-    if not houses:
+
+async def get_searched_houses(
+    query: str,
+    per_page: int = 100,
+    cursor: Optional[str] = None,
+    filters: Optional[HouseSearchFilters] = None,
+) -> Tuple[List[HouseOutSchema], Optional[str]]:
+    resolved = await resolve_search_filters(filters)
+    if resolved is None:
         raise HTTPException(status_code=404, detail="Нет такого дома")
 
-    return houses
+    houses, next_cursor = await cache.get_or_set(
+        "search",
+        search_cache_key(query, per_page, cursor, filters and filters.json()),
+        lambda: get_house(query, per_page, cursor, resolved),
+        HOUSE_CACHE_TTL,
+        Tuple[List[HouseOutSchema], Optional[str]],
+    )
 
+    if not houses:
+        raise HTTPException(status_code=404, detail="Нет такого дома")
 
-async def get_house_by_id_with_logic(house_id: UUID) -> HouseOutOneSchema:
+    return houses, next_cursor
+
+
+async def get_search_facets_with_logic(
+    query: str, filters: Optional[HouseSearchFilters] = None
+) -> SearchFacetsSchema:
+    """Сколько найденных домов в каждом округе и районе (по убыванию)."""
+    resolved = await resolve_search_filters(filters)
+    if resolved is None:
+        return SearchFacetsSchema()
+
+    async def load():
+        facets = await get_search_facets(query, resolved)
+        result = {}
+        for model, column, key in (
+            (AdmArea, "adm_area_id", "adm_areas"),
+            (District, "district_id", "districts"),
+        ):
+            names = {
+                id: name for name, id in (await reference_data.name_map(model)).items()
+            }
+            counts = [
+                FacetCountSchema(name=names[id], count=count)
+                for id, count in facets[column].items()
+                if id in names
+            ]
+            result[key] = sorted(counts, key=lambda facet: (-facet.count, facet.name))
+        return SearchFacetsSchema(**result)
+
+    return await cache.get_or_set(
+        "search",
+        search_cache_key("facets", query, filters and filters.json()),
+        load,
+        HOUSE_CACHE_TTL,
+        SearchFacetsSchema,
+    )
+
+
+async def get_suggestions(prefix: str, limit: int = 10) -> List[HouseSuggestSchema]:
+    """
+    Подсказки адресов для поля поиска. Адреса меняются только при
+    обновлении реестра, поэтому ответы держатся в кэше.
+    """
+
+    async def load():
+        return [
+            HouseSuggestSchema(**row) for row in await suggest_houses(prefix, limit)
+        ]
+
+    return await cache.get_or_set(
+        "suggest",
+        search_cache_key(prefix.strip().lower(), limit),
+        load,
+        HOUSE_CACHE_TTL,
+        List[HouseSuggestSchema],
+    )
+
+
+async def get_house_by_id_with_logic(
+    house_id: UUID, include_geometry: bool = False
+) -> HouseOutOneSchema:
     # Получаем дом из репозитория
-    house = await get_house_by_id(house_id)
+    house = await cache.get_or_set(
+        "house",
+        f"{house_id}:{int(include_geometry)}",
+        lambda: get_house_by_id(house_id, include_geometry),
+        HOUSE_CACHE_TTL,
+        HouseOutOneSchema,
+    )
 
     if not house:
         raise HTTPException(status_code=404, detail="Дом не найден")
 
-    print(f"[INFO] Получен дом с ID: {house.id}")
-
     return house
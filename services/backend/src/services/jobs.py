@@ -0,0 +1,101 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Optional
+from uuid import UUID
+
+from src.main import logger
+from src.schemas.jobs import JobOutSchema
+
+# Сколько завершённых задач хранить для эндпоинта статуса
+JOB_HISTORY_SIZE = 100
+
+JobFunc = Callable[[Callable[[dict], None]], Awaitable[Optional[dict]]]
+
+
+class JobRunner:
+    """
+    Очередь фоновых задач внутри процесса API.
+
+    Эндпоинт ставит задачу в очередь и сразу возвращает её id, а единственный
+    воркер выполняет задачи по одной, чтобы тяжёлые загрузки не шли
+    параллельно. Задача получает колбэк progress(stats) для отчёта о ходе.
+    Состояние хранится в памяти процесса.
+    """
+
+    def __init__(self):
+        self._jobs: "OrderedDict[UUID, JobOutSchema]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def submit(self, name: str, func: JobFunc) -> JobOutSchema:
+        self._ensure_worker()
+        job = JobOutSchema(
+            id=uuid.uuid4(),
+            name=name,
+            status="queued",
+            created_at=datetime.now(timezone.utc),
+        )
+        self._jobs[job.id] = job
+        self._trim_history()
+        self._queue.put_nowait((job, func))
+        return job
+
+    def get(self, job_id: UUID) -> Optional[JobOutSchema]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> list:
+        return list(reversed(self._jobs.values()))
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._work())
+
+    def _trim_history(self):
+        finished = [
+            job_id
+            for job_id, job in self._jobs.items()
+            if job.status in ("completed", "failed")
+        ]
+        for job_id in finished[: max(0, len(self._jobs) - JOB_HISTORY_SIZE)]:
+            del self._jobs[job_id]
+
+    async def _work(self):
+        while True:
+            job, func = await self._queue.get()
+            await self._run(job, func)
+            self._queue.task_done()
+
+    async def _run(self, job: JobOutSchema, func: JobFunc):
+        job.status = "running"
+        job.started_at = datetime.now(timezone.utc)
+        started = time.monotonic()
+
+        def progress(stats: dict):
+            job.stats = dict(stats)
+            elapsed = time.monotonic() - started
+            if elapsed:
+                job.throughput = round(stats.get("processed", 0) / elapsed, 1)
+
+        logger.info(f"Задача {job.name} ({job.id}) запущена")
+        try:
+            result = await func(progress)
+            if result:
+                progress(result)
+            job.status = "completed"
+            logger.info(f"Задача {job.name} ({job.id}) завершена: {job.stats}")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Задача {job.name} ({job.id}) упала: {str(e)}")
+        finally:
+            job.finished_at = datetime.now(timezone.utc)
+
+
+job_runner = JobRunner()
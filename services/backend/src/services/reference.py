@@ -0,0 +1,54 @@
+import os
+import time
+from typing import Dict, List, Type
+from uuid import UUID
+
+from tortoise.models import Model
+
+from src.database.models import AdmArea, District
+
+# Через сколько секунд справочники перечитываются сами (для других воркеров,
+# в процессе с обновлением домов они обновляются сразу после миграции)
+REFERENCE_TTL = int(os.environ.get("REFERENCE_TTL", 3600))
+
+
+class ReferenceData:
+    """
+    Справочники AdmArea и District в памяти процесса: {name: id}.
+    Загружаются при старте приложения (или при первом обращении),
+    перечитываются после обновления домов и по истечении REFERENCE_TTL.
+    """
+
+    models = (AdmArea, District)
+
+    def __init__(self, ttl: int = REFERENCE_TTL):
+        self.ttl = ttl
+        self._maps: Dict[Type[Model], Dict[str, UUID]] = {}
+        self._loaded_at = 0.0
+
+    async def refresh(self):
+        self._maps = {
+            model: dict(await model.all().values_list("name", "id"))
+            for model in self.models
+        }
+        self._loaded_at = time.monotonic()
+
+    def clear(self):
+        self._maps = {}
+        self._loaded_at = 0.0
+
+    async def name_map(self, model: Type[Model]) -> Dict[str, UUID]:
+        """
+        {name: id} справочника. Словарь общий: update_houses дописывает
+        в него созданные записи (см. resolve_names).
+        """
+        if not self._maps or time.monotonic() - self._loaded_at > self.ttl:
+            await self.refresh()
+        return self._maps[model]
+
+    async def items(self, model: Type[Model]) -> List[dict]:
+        names = await self.name_map(model)
+        return [{"id": names[name], "name": name} for name in sorted(names)]
+
+
+reference_data = ReferenceData()
@@ -8,9 +8,14 @@ from src.crud.reviews import (
     update_review_status,
 )
 from src.schemas.reviews import EditReviewSchema, ModerateReviewSchema, ReviewOutSchema
+from src.services.houses import invalidate_house_cache
 
 
 async def moderate_review(data: ModerateReviewSchema) -> ReviewOutSchema:
+    # До обновления: оно сразу меняет сводку рейтинга дома
+    if data.action not in ["approve", "reject"]:
+        raise HTTPException(status_code=400, detail="Недопустимое действие")
+
     review = await update_review_status(
         review_id=data.review_id,
         is_published=(data.action == "approve"),
@@ -20,9 +25,7 @@ async def moderate_review(data: ModerateReviewSchema) -> ReviewOutSchema:
     if not review:
         raise HTTPException(status_code=404, detail="Отзыв не найден")
 
-    if data.action not in ["approve", "reject"]:
-        raise HTTPException(status_code=400, detail="Недопустимое действие")
-
+    await invalidate_house_cache([review.house_id])
     return await review
 
 
@@ -40,5 +43,6 @@ async def edit_review(data: EditReviewSchema, user_id: UUID) -> ReviewOutSchema:
         new_content=data.new_review_text,
         is_published=False,
     )
+    await invalidate_house_cache([review.house_id])
 
     return updated_review
@@ -0,0 +1,103 @@
+import hashlib
+import os
+import secrets
+import uuid
+from datetime import timedelta
+from typing import Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from tortoise.timezone import now
+
+from src.auth.jwthandler import REFRESH_TOKEN_EXPIRE_DAYS
+from src.crud.tokens import (
+    create_refresh_token,
+    delete_expired_refresh_tokens,
+    get_refresh_token,
+    mark_refresh_token_used,
+    revoke_refresh_family,
+)
+from src.crud.users import get_principal
+from src.main import logger
+from src.schemas.users import PrincipalSchema
+
+# Сколько секунд после обмена повторное предъявление токена считается
+# гонкой параллельных запросов (две вкладки), а не кражей
+REFRESH_REUSE_GRACE_SECONDS = int(os.environ.get("REFRESH_REUSE_GRACE_SECONDS", 10))
+
+
+def hash_refresh_token(token: str) -> str:
+    # Токен случайный и длинный — достаточно SHA-256, bcrypt здесь не нужен
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def issue_refresh_token(user_id: UUID, family_id: Optional[UUID] = None) -> str:
+    """
+    Выдаёт новый refresh-токен; без family_id начинается новая цепочка (вход).
+    В БД сохраняется только хеш, значение отдаётся клиенту один раз.
+    Заодно удаляются истёкшие токены: при входе — во всей таблице
+    (по индексу expires_at), при ротации — только в этой цепочке.
+    """
+    await delete_expired_refresh_tokens(family_id)
+    token = secrets.token_urlsafe(32)
+    await create_refresh_token(
+        user_id=user_id,
+        token_hash=hash_refresh_token(token),
+        family_id=family_id or uuid.uuid4(),
+        expires_at=now() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    )
+    return token
+
+
+async def rotate_refresh_token(token: Optional[str]) -> tuple[PrincipalSchema, str]:
+    """
+    Обменивает refresh-токен на пользователя и новый refresh-токен той же
+    цепочки. Старый токен становится недействительным.
+    """
+    invalid_token = HTTPException(status_code=401, detail="Invalid refresh token")
+    if not token:
+        raise invalid_token
+
+    stored = await get_refresh_token(hash_refresh_token(token))
+    if stored is None:
+        raise invalid_token
+
+    if (
+        stored.used_at
+        and not stored.revoked
+        and now() - stored.used_at <= timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS)
+    ):
+        # Токен только что обменян другим запросом того же клиента:
+        # отказываем, но цепочку не трогаем — новый токен уже у клиента
+        raise invalid_token
+
+    if stored.used_at or stored.revoked:
+        # Обменянный токен предъявлен повторно — вероятно, он украден:
+        # отзываем всю цепочку, владельцу придётся войти заново
+        await revoke_refresh_family(stored.family_id)
+        if stored.used_at:
+            logger.warning(
+                f"Повторное использование refresh-токена пользователя {stored.user_id}"
+            )
+        raise invalid_token
+
+    # Истёк или параллельно обменян другим запросом
+    if not await mark_refresh_token_used(stored.id):
+        raise invalid_token
+
+    principal = await get_principal(id=stored.user_id)
+    if principal is None:
+        raise invalid_token
+    if principal.is_blocked:
+        raise HTTPException(status_code=403, detail="User is blocked")
+
+    return principal, await issue_refresh_token(stored.user_id, stored.family_id)
+
+
+async def revoke_refresh_token(token: Optional[str]):
+    """Выход: отзывает цепочку, к которой относится токен."""
+    if not token:
+        return
+    stored = await get_refresh_token(hash_refresh_token(token))
+    if stored is not None:
+        await revoke_refresh_family(stored.family_id)
@@ -1,10 +1,12 @@
 from uuid import UUID
 
 from fastapi import HTTPException
-from passlib.context import CryptContext
 from tortoise.exceptions import DoesNotExist, IntegrityError
 
-from src.crud.reviews import get_reviews_by_user
+from src.auth.jwthandler import invalidate_principal
+from src.auth.passwords import hash_password
+from src.crud.ratings import rebuild_house_ratings
+from src.crud.reviews import get_reviewed_house_ids, get_reviews_by_user
 from src.crud.roles import get_role
 from src.crud.users import (
     create_user_in_db,
@@ -17,38 +19,17 @@ from src.crud.users import (
 from src.schemas.reviews import ReviewSchema
 from src.schemas.token import Status
 from src.schemas.users import UserFrontSchema, UserInSchema, UserOutSchema
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-
-async def is_admin(user: UserOutSchema):
-    user_data = await get_user(user.username)
-    if not user_data or user_data.role_name != "Admin":
-        raise HTTPException(status_code=403, detail="Access denied: Admins only")
-    return user_data
-
-
-async def is_super_user(user: UserOutSchema):
-    user_data = await get_user(user.username)
-    if not user_data or user_data.role_name != "Super User":
-        raise HTTPException(status_code=403, detail="Access denied: Super Users only")
-    return user_data
-
-
-async def is_not_user(user: UserOutSchema):
-    user_data = await get_user(user.username)
-    if not user_data or user_data.role_name == "User":
-        raise HTTPException(status_code=403, detail="Access denied: Not for users")
-    return user_data
+from src.services.houses import invalidate_house_cache
 
 
 async def create_user_with_logic(user: UserInSchema) -> UserOutSchema:
-    user.password = pwd_context.hash(user.password)
-
     existing_user = await get_first_user(username=user.username)
     if existing_user:
         raise HTTPException(status_code=400, detail="Username already exists.")
 
+    # Хешируем после проверки имени: занятое имя не тратит время bcrypt
+    user.password = await hash_password(user.password)
+
     user_dict = user.dict(exclude_unset=True)
 
     if "role_id" not in user_dict:
@@ -72,14 +53,19 @@ async def get_user_with_logic(username: str) -> UserFrontSchema:
 
 async def delete_user_with_logic(user_id: UUID, current_user_id: UUID) -> Status:
     try:
-        await get(user_id)
+        user = await get(user_id)
     except DoesNotExist:
         raise HTTPException(status_code=404, detail=f"Пользователь {user_id} не найден")
 
     if user_id == current_user_id:
+        # Отзывы удаляются каскадно — сводки рейтинга затронутых домов пересчитаем
+        house_ids = await get_reviewed_house_ids(user_id)
         deleted_count = await delete_user_by_id(user_id)
         if not deleted_count:
             raise HTTPException(status_code=404, detail=f"User {user_id} not found")
+        await rebuild_house_ratings(house_ids)
+        await invalidate_house_cache(house_ids)
+        await invalidate_principal(user.id)
         return Status(message=f"Deleted user {user_id}")  # UPDATED
 
     raise HTTPException(status_code=403, detail=f"Not authorized to delete")
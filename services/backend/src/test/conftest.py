@@ -2,11 +2,13 @@ import httpx
 import pytest_asyncio
 from tortoise import Tortoise
 
-from src.auth.jwthandler import get_current_user
-from src.crud.users import pwd_context
+from src.auth.jwthandler import get_current_user, principal_cache
+from src.auth.passwords import pwd_context
+from src.cache import cache
+from src.crud.users import get_principal
 from src.database.models import AdmArea, District, House, Review, Role, User
 from src.main import app
-from src.schemas.users import UserOutSchema
+from src.services.reference import reference_data
 
 TORTOISE_ORM = {
     "connections": {
@@ -31,6 +33,10 @@ async def initialize_tests():
         modules={"models": ["src.database.models", "aerich.models"]},
     )
     await Tortoise.generate_schemas()
+    # База в каждом тесте новая — кэш ответов от прошлых тестов не нужен
+    await cache.backend.clear()
+    await principal_cache.backend.clear()
+    reference_data.clear()
     yield
     await Tortoise.close_connections()
 
@@ -121,7 +127,7 @@ async def house(adm_area, district):
         geodata_center="POINT (37.6173 55.7558)",
         kad_n="1234567890",  # Добавьте, если требуется
         kad_zu="0987654321",
-        geo_data="Some geo data",
+        geo_data="POLYGON ((37.617 55.755, 37.618 55.755, 37.618 55.756, 37.617 55.755))",
     )
     return house_instance
 
@@ -165,9 +171,7 @@ async def review_superuser(house, superuser):
 @pytest_asyncio.fixture
 async def mock_authenticated_user(user):
     async def override_get_current_user():
-        return await UserOutSchema.from_queryset_single(
-            User.get(username=user.username)
-        )
+        return await get_principal(username=user.username)
 
     app.dependency_overrides[get_current_user] = override_get_current_user
     yield override_get_current_user
@@ -177,9 +181,7 @@ async def mock_authenticated_user(user):
 @pytest_asyncio.fixture
 async def mock_authenticated_superuser(superuser):
     async def override_get_current_user():
-        return await UserOutSchema.from_queryset_single(
-            User.get(username=superuser.username)
-        )
+        return await get_principal(username=superuser.username)
 
     app.dependency_overrides[get_current_user] = override_get_current_user
     yield override_get_current_user
@@ -189,9 +191,7 @@ async def mock_authenticated_superuser(superuser):
 @pytest_asyncio.fixture
 async def mock_authenticated_admin(admin):
     async def override_get_current_user():
-        return await UserOutSchema.from_queryset_single(
-            User.get(username=admin.username)
-        )
+        return await get_principal(username=admin.username)
 
     app.dependency_overrides[get_current_user] = override_get_current_user
     yield override_get_current_user
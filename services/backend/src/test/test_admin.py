@@ -1,5 +1,13 @@
+import asyncio
+from uuid import uuid4
+
 import pytest
 
+import src.utils.update_houses as update
+import src.utils.upload_data as upload
+from src.database.models import HouseRating
+from src.helpers import encode_cursor
+
 
 @pytest.mark.asyncio
 async def test_moderate_review_approve_success(
@@ -18,6 +26,29 @@ async def test_moderate_review_approve_success(
     assert json_response["is_deleted"] is False
 
 
+@pytest.mark.asyncio
+async def test_moderate_review_updates_rating_summary(
+    review, client, mock_authenticated_admin
+):
+    data = {"review_id": str(review.id), "action": "approve"}
+    response = await client.post("/review/moderate", json=data)
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+
+    summary = await HouseRating.get(house_id=review.house_id)
+    assert summary.rating_sum == 4
+    assert summary.rating_count == 1
+    assert summary.count_4 == 1
+
+    data = {"review_id": str(review.id), "action": "reject"}
+    response = await client.post("/review/moderate", json=data)
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+
+    summary = await HouseRating.get(house_id=review.house_id)
+    assert summary.rating_sum == 0
+    assert summary.rating_count == 0
+    assert summary.count_4 == 0
+
+
 @pytest.mark.asyncio
 async def test_moderate_review_reject_success(review, client, mock_authenticated_admin):
     data = {"review_id": str(review.id), "action": "reject"}
@@ -32,12 +63,21 @@ async def test_moderate_review_reject_success(review, client, mock_authenticated
 
 @pytest.mark.asyncio
 async def test_moderate_review_invalid_action(review, client, mock_authenticated_admin):
-    data = {"review_id": str(review.id), "action": "delete"}
+    data = {"review_id": str(review.id), "action": "approve"}
+    response = await client.post("/review/moderate", json=data)
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
 
+    data = {"review_id": str(review.id), "action": "delete"}
     response = await client.post("/review/moderate", json=data)
     assert response.status_code == 400, f"Ошибка: {response.json()}"
     assert response.json() == {"detail": "Недопустимое действие"}
 
+    # Отзыв и сводка рейтинга не изменились
+    await review.refresh_from_db()
+    assert review.is_published is True
+    summary = await HouseRating.get(house_id=review.house_id)
+    assert summary.rating_count == 1
+
 
 @pytest.mark.asyncio
 async def test_moderate_review_not_found(client, mock_authenticated_admin):
@@ -66,3 +106,106 @@ async def test_moderate_review_unauthorized(
     response = await client.post("/review/moderate", json=data)
     assert response.status_code == 403, f"Ошибка: {response.json()}"
     assert response.json() == {"detail": "Access denied: Admins only"}
+
+
+@pytest.mark.asyncio
+async def test_admin_stats_average_rating(review, client, mock_authenticated_admin):
+    data = {"review_id": str(review.id), "action": "approve"}
+    response = await client.post("/review/moderate", json=data)
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+
+    response = await client.get("/admin/stats")
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    json_response = response.json()
+    assert json_response["total_reviews"] == 1
+    assert json_response["pending_reviews"] == 0
+    assert json_response["average_rating"] == 4
+
+
+@pytest.mark.asyncio
+async def test_admin_users_cursor_pagination(
+    user, another_user, client, mock_authenticated_admin
+):
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/admin/users", params=params)
+        assert response.status_code == 200, f"Ошибка: {response.json()}"
+        page = response.json()
+        assert len(page) <= 2
+        seen.extend(item["username"] for item in page)
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert sorted(seen) == sorted([user.username, another_user.username, "admin"])
+
+
+@pytest.mark.asyncio
+async def test_admin_users_malformed_cursor(client, mock_authenticated_admin):
+    # Правильная структура, но id не UUID и дата не дата
+    for values in (["2025-01-01T00:00:00", "not-a-uuid"], [1, str(uuid4())]):
+        response = await client.get(
+            "/admin/users", params={"cursor": encode_cursor(values)}
+        )
+        assert response.status_code == 400, f"Ошибка: {response.json()}"
+        assert response.json() == {"detail": "Некорректный курсор"}
+
+
+async def wait_for_job(client, job_id):
+    for _ in range(100):
+        response = await client.get(f"/admin/jobs/{job_id}")
+        assert response.status_code == 200, f"Ошибка: {response.json()}"
+        job = response.json()
+        if job["status"] in ("completed", "failed"):
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError("Задача не завершилась")
+
+
+@pytest.mark.asyncio
+async def test_upload_runs_as_background_job(
+    client, mock_authenticated_admin, monkeypatch
+):
+    async def fake_upload(progress):
+        progress({"processed": 10, "inserted": 5})
+        return {"processed": 20, "inserted": 7}
+
+    monkeypatch.setattr(upload, "main", fake_upload)
+
+    response = await client.post("/admin/upload")
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    json_response = response.json()
+    assert json_response["status"] == "queued"
+
+    job = await wait_for_job(client, json_response["job_id"])
+    assert job["status"] == "completed"
+    assert job["name"] == "upload"
+    assert job["stats"] == {"processed": 20, "inserted": 7}
+
+
+@pytest.mark.asyncio
+async def test_update_houses_job_failure_is_reported(
+    client, mock_authenticated_admin, monkeypatch
+):
+    async def failing_update(progress, incremental=False):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(update, "main", failing_update)
+
+    response = await client.post("/admin/update-houses")
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+
+    job = await wait_for_job(client, response.json()["job_id"])
+    assert job["status"] == "failed"
+    assert job["error"] == "boom"
+
+
+@pytest.mark.asyncio
+async def test_job_not_found(client, mock_authenticated_admin):
+    response = await client.get("/admin/jobs/123e4567-e89b-12d3-a456-426614174000")
+    assert response.status_code == 404, f"Ошибка: {response.json()}"
+    assert response.json() == {"detail": "Задача не найдена"}
@@ -0,0 +1,132 @@
+import json
+
+import pytest
+
+from src.cache import Cache, LocalTTLCache, RedisCache, cache
+
+
+class FakeRedis:
+    """Минимальная замена redis.asyncio.Redis для тестов RedisCache."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def incr(self, key):
+        self.data[key] = int(self.data.get(key) or 0) + 1
+        return self.data[key]
+
+    async def scan_iter(self, pattern):
+        for key in list(self.data):
+            if key.startswith(pattern.rstrip("*")):
+                yield key
+
+
+@pytest.mark.asyncio
+async def test_house_detail_cached_and_invalidated_on_moderation(
+    review, client, mock_authenticated_admin
+):
+    hits = cache.hits["house"]
+    response = await client.get(f"/house/{review.house_id}")
+    assert response.json()["rating_count"] == "0"
+    response = await client.get(f"/house/{review.house_id}")
+    assert response.json()["rating_count"] == "0"
+    assert cache.hits["house"] == hits + 1
+
+    data = {"review_id": str(review.id), "action": "approve"}
+    response = await client.post("/review/moderate", json=data)
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+
+    response = await client.get(f"/house/{review.house_id}")
+    assert response.json()["rating_count"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_search_cache_invalidated_on_moderation(
+    review, client, mock_authenticated_admin
+):
+    response = await client.get("/houses/search?query=test_house")
+    assert response.json()[0]["rating"] == "0"
+
+    data = {"review_id": str(review.id), "action": "approve"}
+    await client.post("/review/moderate", json=data)
+
+    response = await client.get("/houses/search?query=test_house")
+    assert response.json()[0]["rating"] == "4.0"
+
+
+@pytest.mark.asyncio
+async def test_admin_metrics(client, mock_authenticated_admin):
+    response = await client.get("/admin/metrics")
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    assert response.json()["cache"]["backend"] == "local"
+
+
+@pytest.mark.asyncio
+async def test_local_cache_lru_and_ttl():
+    backend = LocalTTLCache(max_items=2)
+    await backend.set("a", 1, ttl=60)
+    await backend.set("b", 2, ttl=60)
+    await backend.get("a")
+    await backend.set("c", 3, ttl=60)
+    # Вытеснен самый давно использованный ключ
+    assert await backend.get("b") is None
+    assert await backend.get("a") == 1
+
+    await backend.set("d", 4, ttl=-1)
+    assert await backend.get("d") is None
+
+
+@pytest.mark.asyncio
+async def test_redis_cache_versions():
+    test_cache = Cache(RedisCache(FakeRedis()))
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        return {"value": len(calls)}
+
+    assert await test_cache.get_or_set("ns", "key", loader, 60) == {"value": 1}
+    assert await test_cache.get_or_set("ns", "key", loader, 60) == {"value": 1}
+    await test_cache.invalidate("ns")
+    assert await test_cache.get_or_set("ns", "key", loader, 60) == {"value": 2}
+    assert test_cache.metrics()["namespaces"]["ns"] == {
+        "hits": 1,
+        "misses": 2,
+        "hit_rate": 0.333,
+    }
+
+
+@pytest.mark.asyncio
+async def test_redis_cache_stores_json(review, client, monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(cache, "backend", RedisCache(fake))
+
+    urls = [
+        f"/house/{review.house_id}",
+        "/houses/search?query=test_house",
+        "/houses/search/facets?query=test_house",
+        "/houses/suggest?prefix=test",
+    ]
+    responses = [await client.get(url) for url in urls]
+    assert [response.status_code for response in responses] == [200] * len(urls)
+    hits = sum(cache.hits.values())
+    # Второй раз ответы собираются из JSON в Redis и не отличаются
+    assert [(await client.get(url)).json() for url in urls] == [
+        response.json() for response in responses
+    ]
+    assert sum(cache.hits.values()) == hits + len(urls)
+
+    values = [value for key, value in fake.data.items() if ":version:" not in key]
+    assert values
+    for value in values:
+        json.loads(value)
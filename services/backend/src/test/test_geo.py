@@ -0,0 +1,154 @@
+import pytest
+import pytest_asyncio
+
+import src.services.geo as geo
+from src.crud.ratings import rebuild_house_ratings
+from src.database.models import House, Review
+
+
+@pytest_asyncio.fixture
+async def map_houses(house, adm_area, district):
+    # Соседний дом в ~100 м от house и дальний в Санкт-Петербурге
+    near = await House.create(
+        unom="near_house",
+        full_address="Near Address",
+        simple_address="Near Simple Address",
+        adm_area=adm_area,
+        district=district,
+        geodata_center="POINT (37.6183 55.7562)",
+    )
+    far = await House.create(
+        unom="far_house",
+        full_address="Far Address",
+        simple_address="Far Simple Address",
+        adm_area=adm_area,
+        district=district,
+        geodata_center="POINT (30.3158 59.9391)",
+    )
+    return [house, near, far]
+
+
+@pytest.mark.asyncio
+async def test_map_bbox_points(map_houses, user, client):
+    house = map_houses[0]
+    await Review.create(
+        house=house, user=user, rating=4, review_text="ok", is_published=True
+    )
+    await rebuild_house_ratings()
+
+    response = await client.get("/houses/map", params={"bbox": "37.5,55.7,37.7,55.8"})
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    data = response.json()
+    assert data["clusters"] == []
+    assert data["truncated"] is False
+    points = {point["unom"]: point for point in data["points"]}
+    assert set(points) == {"test_house", "near_house"}
+    assert points["test_house"]["latitude"] == 55.7558
+    assert points["test_house"]["longitude"] == 37.6173
+    assert points["test_house"]["rating"] == 4
+    assert points["near_house"]["rating"] == 0
+
+
+@pytest.mark.asyncio
+async def test_map_bbox_truncated_stable(map_houses, client):
+    params = {"bbox": "29,55,38,60", "limit": 2}
+    # Без круга точки упорядочены по id: обрезка по limit детерминирована
+    expected = sorted(str(house.id) for house in map_houses)[:2]
+    for _ in range(3):
+        response = await client.get("/houses/map", params=params)
+        assert response.status_code == 200, f"Ошибка: {response.json()}"
+        data = response.json()
+        assert [point["id"] for point in data["points"]] == expected
+        assert data["truncated"] is True
+
+
+@pytest.mark.asyncio
+async def test_map_radius_sorted_by_distance(map_houses, client):
+    response = await client.get(
+        "/houses/map",
+        params={"lat": 55.7561, "lon": 37.6182, "radius": 500, "limit": 1},
+    )
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    data = response.json()
+    assert [point["unom"] for point in data["points"]] == ["near_house"]
+    assert data["truncated"] is True
+
+
+@pytest.mark.asyncio
+async def test_map_clusters_low_zoom(map_houses, client):
+    response = await client.get(
+        "/houses/map", params={"bbox": "29,55,38,60", "zoom": 5}
+    )
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    data = response.json()
+    assert data["points"] == []
+    assert sorted(cluster["count"] for cluster in data["clusters"]) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_map_requires_area(client):
+    response = await client.get("/houses/map")
+    assert response.status_code == 400, f"Ошибка: {response.json()}"
+
+    response = await client.get("/houses/map", params={"bbox": "1,2,3"})
+    assert response.status_code == 400, f"Ошибка: {response.json()}"
+
+
+@pytest.mark.asyncio
+async def test_tile_empty_below_min_zoom(client):
+    response = await client.get("/tiles/3/4/2.mvt")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.mapbox-vector-tile"
+    assert response.content == b""
+
+
+@pytest.mark.asyncio
+async def test_tile_invalid_coordinates(client):
+    response = await client.get("/tiles/2/4/0.mvt")
+    assert response.status_code == 400, f"Ошибка: {response.json()}"
+
+
+@pytest.mark.asyncio
+async def test_tile_disk_cache(client, monkeypatch, tmp_path):
+    calls = []
+
+    async def fake_tile(z, x, y, tolerance):
+        calls.append((z, x, y))
+        return b"tile"
+
+    monkeypatch.setattr(geo, "TILE_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(geo, "get_tile", fake_tile)
+
+    for _ in range(2):
+        response = await client.get("/tiles/14/9904/5122.mvt")
+        assert response.status_code == 200
+        assert response.content == b"tile"
+    assert calls == [(14, 9904, 5122)]
+
+    # После обновления домов тайл строится заново
+    geo.clear_tile_cache()
+    await client.get("/tiles/14/9904/5122.mvt")
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_house_geometry_geojson(house, client):
+    response = await client.get(f"/house/{house.id}/geometry")
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    data = response.json()
+    assert data["type"] == "Feature"
+    assert data["id"] == str(house.id)
+    assert data["properties"] == {"unom": house.unom}
+    assert data["geometry"]["type"] == "Polygon"
+    assert len(data["geometry"]["coordinates"][0]) == 4
+
+    response = await client.get(
+        f"/house/{house.id}/geometry", params={"tolerance": 0.01}
+    )
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+
+
+@pytest.mark.asyncio
+async def test_house_geometry_not_found(client):
+    response = await client.get("/house/123e4567-e89b-12d3-a456-426614174000/geometry")
+    assert response.status_code == 404, f"Ошибка: {response.json()}"
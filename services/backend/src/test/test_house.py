@@ -1,9 +1,16 @@
+from datetime import datetime, timezone
 from unittest.mock import AsyncMock
-from uuid import uuid4
+from uuid import UUID, uuid4
 
 import pytest
+from fastapi import HTTPException
 from httpx import AsyncClient
 
+from src.crud.ratings import rebuild_house_ratings
+from src.database.models import AdmArea, District, House, Review
+from src.helpers import decode_cursor, encode_cursor
+from src.services.reference import reference_data
+
 
 @pytest.mark.asyncio
 async def test_create_review_user(house, client, mock_authenticated_user):
@@ -58,6 +65,9 @@ async def test_search_houses_found(house, client):
     assert data[0]["simple_address"] == house.simple_address
     assert data[0]["adm_area"] == house.adm_area.name
     assert data[0]["district"] == house.district.name
+    assert data[0]["latitude"] == 55.7558
+    assert data[0]["longitude"] == 37.6173
+    assert "search_address" not in data[0]
 
 
 @pytest.mark.asyncio
@@ -76,6 +86,147 @@ async def test_search_houses_multiple(multiple_houses, client):
     assert data[0]["unom"] == "another_house"
 
 
+@pytest.mark.asyncio
+async def test_search_houses_normalized_query(house, client):
+    # Регистр и знаки препинания не влияют на поиск
+    response = await client.get("/houses/search?query=TEST-house")
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    data = response.json()
+    assert len(data) == 1
+    assert data[0]["unom"] == house.unom
+
+
+@pytest.mark.asyncio
+async def test_search_houses_rating(house, user, another_user, client):
+    await Review.create(
+        house=house, user=user, rating=5, review_text="Хорошо", is_published=True
+    )
+    await Review.create(
+        house=house,
+        user=another_user,
+        rating=4,
+        review_text="Неплохо",
+        is_published=True,
+    )
+    await Review.create(house=house, user=user, rating=1, review_text="На модерации")
+    # Отзывы созданы в обход сервиса — пересобираем сводку
+    await rebuild_house_ratings()
+
+    response = await client.get("/houses/search?query=test_house")
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    data = response.json()
+    assert data[0]["rating"] == "4.5"
+    assert data[0]["rating_count"] == "2"
+    assert len(data[0]["reviews"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_search_houses_filters_and_facets(multiple_houses, user, client):
+    house, another = multiple_houses
+    other_district = await District.create(name="Other District")
+    await House.create(
+        unom="third_house",
+        full_address="Third Address",
+        simple_address="Third Simple Address",
+        obj_type="Здание",
+        adm_area_id=house.adm_area_id,
+        district=other_district,
+    )
+    await Review.create(
+        house=house, user=user, rating=5, review_text="Хорошо", is_published=True
+    )
+    await Review.create(
+        house=another, user=user, rating=2, review_text="Плохо", is_published=True
+    )
+    await rebuild_house_ratings()
+
+    async def unoms(**params):
+        response = await client.get(
+            "/houses/search", params={"query": "address", **params}
+        )
+        if response.status_code == 404:
+            return set()
+        assert response.status_code == 200, f"Ошибка: {response.json()}"
+        return {item["unom"] for item in response.json()}
+
+    assert await unoms() == {"test_house", "another_house", "third_house"}
+    assert await unoms(district="Other District") == {"third_house"}
+    assert await unoms(obj_type="Здание") == {"third_house"}
+    assert await unoms(min_rating=4) == {"test_house"}
+    # Дробный порог: средние 5 и 2
+    assert await unoms(min_rating=4.5) == {"test_house"}
+    assert await unoms(min_rating=2.5) == {"test_house"}
+    assert await unoms(min_rating=1.5) == {"test_house", "another_house"}
+    assert await unoms(has_reviews=True) == {"test_house", "another_house"}
+    assert await unoms(has_reviews=False) == {"third_house"}
+    assert await unoms(district="Нет такого района") == set()
+
+    response = await client.get("/houses/search/facets", params={"query": "address"})
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    assert response.json() == {
+        "adm_areas": [{"name": "Test Adm Area", "count": 3}],
+        "districts": [
+            {"name": "Test District", "count": 2},
+            {"name": "Other District", "count": 1},
+        ],
+    }
+
+    response = await client.get(
+        "/houses/search/facets", params={"query": "address", "has_reviews": True}
+    )
+    assert response.json()["districts"] == [{"name": "Test District", "count": 2}]
+
+
+@pytest.mark.asyncio
+async def test_search_houses_cursor_pagination(multiple_houses, client):
+    response = await client.get("/houses/search?query=address&limit=1")
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    first_page = response.json()
+    assert len(first_page) == 1
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = await client.get(
+        "/houses/search", params={"query": "address", "limit": 1, "cursor": cursor}
+    )
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    second_page = response.json()
+    assert len(second_page) == 1
+    assert "X-Next-Cursor" not in response.headers
+    assert {first_page[0]["unom"], second_page[0]["unom"]} == {
+        "test_house",
+        "another_house",
+    }
+
+
+@pytest.mark.asyncio
+async def test_search_houses_invalid_cursor(house, client):
+    response = await client.get("/houses/search?query=test&cursor=garbage")
+    assert response.status_code == 400, f"Ошибка: {response.json()}"
+
+    # Подделанный курсор с id не в формате UUID
+    cursor = encode_cursor(["Test Simple Address", "1; DROP TABLE houses"])
+    response = await client.get(
+        "/houses/search", params={"query": "test", "cursor": cursor}
+    )
+    assert response.status_code == 400, f"Ошибка: {response.json()}"
+
+
+def test_decode_cursor_types():
+    house_id = uuid4()
+    created_at = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    cursor = encode_cursor([-1.5, 12, house_id, created_at])
+    assert decode_cursor(cursor, float, int, UUID, datetime) == [
+        -1.5,
+        12,
+        house_id,
+        created_at,
+    ]
+    for bad in ([True, 12, str(house_id)], ["1.5", 12, str(house_id)], [1.5, 12]):
+        with pytest.raises(HTTPException) as exc_info:
+            decode_cursor(encode_cursor(bad), float, int, UUID)
+        assert exc_info.value.status_code == 400
+
+
 @pytest.mark.asyncio
 async def test_search_houses_not_found(client):
     response = await client.get("/houses/search?query=nonexistent")
@@ -97,6 +248,28 @@ async def test_get_house_by_id_found(house, client):
     assert data["id"] == str(house.id)
 
 
+@pytest.mark.asyncio
+async def test_get_house_by_id_without_geometry(house, client):
+    response = await client.get(f"/house/{house.id}")
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    data = response.json()
+    assert data["geo_data"] is None
+    assert data["geodata_center"] is None
+    assert data["latitude"] == 55.7558
+
+
+@pytest.mark.asyncio
+async def test_get_house_by_id_geometry(house, client):
+    response = await client.get(f"/house/{house.id}?include_geometry=true")
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    data = response.json()
+    # В БД хранится EWKT, наружу отдаётся WKT без SRID
+    assert data["geodata_center"] == "POINT (37.6173 55.7558)"
+    assert data["geo_data"].startswith("POLYGON ((")
+    assert data["longitude"] == 37.6173
+    assert data["latitude"] == 55.7558
+
+
 @pytest.mark.asyncio
 async def test_get_house_by_id_not_found(client):
     response = await client.get("/house/123e4567-e89b-12d3-a456-426614174000")
@@ -108,3 +281,92 @@ async def test_get_house_by_id_not_found(client):
 async def test_get_house_by_id_invalid_uuid(client):
     response = await client.get("/house/invalid-uuid")
     assert response.status_code == 422, f"Ошибка: {response.json()}"
+
+
+@pytest.mark.asyncio
+async def test_get_house_by_id_conditional(review, client, mock_authenticated_admin):
+    url = f"/house/{review.house_id}"
+    response = await client.get(url)
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+    assert response.headers["Cache-Control"] == "public, max-age=60"
+
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+    response = await client.get(url, headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    # Другое представление — другой ETag
+    response = await client.get(
+        f"{url}?include_geometry=true", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+
+    # Модерация отзыва меняет версию дома
+    data = {"review_id": str(review.id), "action": "approve"}
+    await client.post("/review/moderate", json=data)
+    response = await client.get(url, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_search_houses_conditional(house, client):
+    response = await client.get("/houses/search?query=test_house")
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    etag = response.headers["ETag"]
+
+    response = await client.get(
+        "/houses/search?query=test_house", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    response = await client.get(
+        "/houses/search?query=another", headers={"If-None-Match": etag}
+    )
+    assert response.status_code != 304
+
+
+@pytest.mark.asyncio
+async def test_unique_reference_data_cached(adm_area, district, client):
+    response = await client.get("/houses/unique-adm-areas")
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "public, max-age=3600"
+    assert response.json() == {
+        "adm_areas": [{"id": str(adm_area.id), "name": adm_area.name}]
+    }
+
+    # Справочник читается из памяти до явного обновления
+    await AdmArea.create(name="Новый округ")
+    response = await client.get("/houses/unique-adm-areas")
+    assert len(response.json()["adm_areas"]) == 1
+
+    await reference_data.refresh()
+    response = await client.get("/houses/unique-adm-areas")
+    assert len(response.json()["adm_areas"]) == 2
+
+    response = await client.get("/houses/unique-districts")
+    assert response.json() == {
+        "districts": [{"id": str(district.id), "name": district.name}]
+    }
+
+
+@pytest.mark.asyncio
+async def test_suggest_houses(multiple_houses, client):
+    response = await client.get("/houses/suggest", params={"prefix": "another"})
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    assert response.json() == [
+        {"id": str(multiple_houses[1].id), "simple_address": "Another Simple Address"}
+    ]
+    assert response.headers["Cache-Control"] == "public, max-age=300"
+
+    # Ищется только начало адреса
+    response = await client.get("/houses/suggest", params={"prefix": "simple"})
+    assert response.json() == []
+
+    response = await client.get("/houses/suggest", params={"prefix": "a"})
+    assert response.status_code == 422
@@ -0,0 +1,222 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import src.services.geo as geo
+import src.utils.update_houses as update
+from src.database.models import AdmArea, District, House, RawAddress
+from src.utils.update_houses import (
+    count_missing_houses,
+    iter_raw_batches,
+    migrate_batch,
+    migrate_data,
+    transform_batches,
+)
+from src.utils.upload_data import load_raw_addresses
+
+
+def raw_record(unom, district="Арбат", adm_area="ЦАО", address=None) -> dict:
+    address = address or f"улица Тестовая, дом {unom}"
+    return {
+        "UNOM": unom,
+        "OBJ_TYPE": "Здание",
+        "ADDRESS": f"город Москва, {address}",
+        "SIMPLE_ADDRESS": address,
+        "ADM_AREA": adm_area,
+        "DISTRICT": district,
+        "geodata_center": {"type": "Point", "coordinates": [37.6, 55.75]},
+        "geoData": {
+            "type": "Polygon",
+            "coordinates": [
+                [[37.6, 55.75], [37.61, 55.75], [37.61, 55.76], [37.6, 55.75]]
+            ],
+        },
+    }
+
+
+async def add_raw(records: list):
+    await RawAddress.bulk_create([RawAddress(raw_data=record) for record in records])
+
+
+@pytest.fixture(autouse=True)
+def tile_cache_dir(tmp_path, monkeypatch):
+    # migrate_data сбрасывает кэш тайлов — не трогаем каталог проекта
+    monkeypatch.setattr(geo, "TILE_CACHE_DIR", str(tmp_path / "tiles"))
+
+
+@pytest.mark.asyncio
+async def test_iter_raw_batches_covers_boundaries():
+    await add_raw([raw_record(unom) for unom in range(7)])
+
+    batches = [batch async for batch in iter_raw_batches(batch_size=3)]
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    # Keyset по id: на границах пачек записи не теряются и не повторяются
+    unoms = [record["UNOM"] for batch in batches for record in batch]
+    assert sorted(unoms) == list(range(7))
+
+
+@pytest.mark.asyncio
+async def test_migrate_data_batches():
+    await add_raw(
+        [
+            raw_record(1),
+            raw_record(2, district="Хамовники"),
+            raw_record(3, district="Тверской"),
+            raw_record(4, district="Хамовники"),
+            raw_record(5, adm_area="САО", district="Аэропорт"),
+            # Без района — запись пропускается
+            {**raw_record(6), "DISTRICT": None},
+        ]
+    )
+
+    totals = await migrate_data(batch_size=2, workers=1)
+    assert totals == {
+        "processed": 6,
+        "inserted": 5,
+        "updated": 0,
+        "skipped": 1,
+        "errors": 0,
+    }
+
+    houses = await House.all().select_related("adm_area", "district")
+    assert sorted(house.unom for house in houses) == ["1", "2", "3", "4", "5"]
+    by_unom = {house.unom: house for house in houses}
+    assert by_unom["2"].district.name == "Хамовники"
+    assert by_unom["5"].adm_area.name == "САО"
+    # Справочники созданы по одному разу, даже если имя встречалось в разных пачках
+    assert await AdmArea.all().count() == 2
+    assert await District.all().count() == 4
+    assert by_unom["2"].district_id == by_unom["4"].district_id
+
+    house = by_unom["1"]
+    assert house.latitude == pytest.approx(55.75)
+    assert house.longitude == pytest.approx(37.6)
+    assert house.content_hash
+    assert "тестовая" in house.search_address
+
+    # Повторный запуск не создаёт дубликатов
+    totals = await migrate_data(batch_size=2, workers=1)
+    assert totals["inserted"] == 0
+    assert totals["skipped"] == 6
+    assert await House.all().count() == 5
+
+
+@pytest.mark.asyncio
+async def test_migrate_batch_counts_only_inserted(monkeypatch):
+    transformed = update.transform_batch([raw_record(1), raw_record(2)])
+    resolve_names = update.resolve_names
+
+    async def resolve_and_race(model, cache, names):
+        cache = await resolve_names(model, cache, names)
+        # Параллельная миграция успела вставить дом 2 после сверки UNOM
+        if model is District and not await House.filter(unom="2").exists():
+            await House.create(
+                unom="2",
+                full_address="Параллельная вставка",
+                simple_address="Параллельная вставка",
+                adm_area_id=next(iter(adm_areas.values())),
+                district_id=cache["Арбат"],
+            )
+        return cache
+
+    monkeypatch.setattr(update, "resolve_names", resolve_and_race)
+    adm_areas = {}
+    stats = await migrate_batch(transformed, adm_areas, {})
+    assert stats["inserted"] == 1
+    assert stats["skipped"] == 1
+    assert await House.all().count() == 2
+
+
+@pytest.mark.asyncio
+async def test_transform_batches_keeps_order(monkeypatch):
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def slow_transform(raw_batch):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        # Первые пачки преобразуются дольше последних
+        time.sleep(0.05 / raw_batch[0])
+        with lock:
+            running -= 1
+        return raw_batch
+
+    monkeypatch.setattr(update, "transform_batch", slow_transform)
+
+    async def raw_batches():
+        for index in range(1, 7):
+            yield [index]
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        result = [batch async for batch in transform_batches(pool, raw_batches(), 3)]
+
+    assert result == [[index] for index in range(1, 7)]
+    # В пуле одновременно несколько пачек, но не больше workers
+    assert 1 < max_running <= 3
+
+
+@pytest.mark.asyncio
+async def test_migrate_data_process_pool():
+    await add_raw([raw_record(unom) for unom in range(10)])
+
+    totals = await migrate_data(batch_size=3, workers=2)
+    assert totals["inserted"] == 10
+    assert await House.all().count() == 10
+
+
+def write_registry(path, records: list) -> str:
+    path.write_bytes(json.dumps(records, ensure_ascii=False).encode("cp1251"))
+    return str(path)
+
+
+@pytest.mark.asyncio
+async def test_migrate_data_incremental(tmp_path):
+    release = [{**raw_record(unom), "global_id": 100 + unom} for unom in range(1, 4)]
+    await load_raw_addresses(write_registry(tmp_path / "v1.json", release))
+    await migrate_data(batch_size=2, workers=1)
+    before = {house.unom: house for house in await House.all()}
+
+    # Новая версия реестра: 1 без изменений, у 2 новый адрес,
+    # 3 выбыл из реестра, 4 — новый дом
+    release = [
+        release[0],
+        {**raw_record(2, address="проспект Новый, дом 2"), "global_id": 102},
+        {**raw_record(4), "global_id": 104},
+    ]
+    stats = await load_raw_addresses(write_registry(tmp_path / "v2.json", release))
+    assert stats == {"processed": 3, "inserted": 1, "updated": 1, "removed": 1}
+
+    totals = await migrate_data(batch_size=2, workers=1, incremental=True)
+    assert totals == {
+        "processed": 3,
+        "inserted": 1,
+        "updated": 1,
+        "skipped": 1,
+        "errors": 0,
+        "missing": 1,
+    }
+
+    after = {house.unom: house for house in await House.all()}
+    assert sorted(after) == ["1", "2", "3", "4"]
+    # Изменённый дом обновлён на месте, неизменённый не тронут
+    assert after["2"].id == before["2"].id
+    assert after["2"].simple_address == "проспект Новый, дом 2"
+    assert "проспект новый" in after["2"].search_address
+    assert after["2"].content_hash != before["2"].content_hash
+    assert after["2"].updated_at > before["2"].updated_at
+    assert after["1"].updated_at == before["1"].updated_at
+    # Выбывший дом не удаляется — только попадает в отчёт
+    assert after["3"].content_hash == before["3"].content_hash
+
+
+@pytest.mark.asyncio
+async def test_count_missing_houses(house, multiple_houses):
+    assert await count_missing_houses({"test_house", "another_house"}) == 0
+    assert await count_missing_houses({"test_house"}, batch_size=1) == 1
+    assert await count_missing_houses(set(), batch_size=1) == 2
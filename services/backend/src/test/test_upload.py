@@ -0,0 +1,97 @@
+import json
+
+import pytest
+
+from src.database.models import RawAddress
+from src.utils.upload_data import (
+    load_raw_addresses,
+    read_json_in_chunks,
+    upsert_raw_addresses,
+)
+
+
+def write_registry(path, records: list) -> str:
+    # Реестр выгружается в cp1251
+    path.write_bytes(json.dumps(records, ensure_ascii=False).encode("cp1251"))
+    return str(path)
+
+
+def test_read_json_in_chunks_cp1251(tmp_path):
+    # Больше буфера ijson (64 КБ): кириллица попадает на границы чтения
+    records = [
+        {
+            "global_id": i,
+            "ADDRESS": f"город Москва, улица Ёлочная, дом {i}",
+            "AREA": 10.5,
+        }
+        for i in range(2000)
+    ]
+    file_path = write_registry(tmp_path / "registry.json", records)
+
+    chunks = list(read_json_in_chunks(file_path, chunk_size=900))
+    assert [len(chunk) for chunk in chunks] == [900, 900, 200]
+    assert [record for chunk in chunks for record in chunk] == records
+
+
+@pytest.mark.asyncio
+async def test_load_raw_addresses_deduplicates(tmp_path):
+    await RawAddress.create(raw_data={"global_id": 1, "ADDRESS": "Старый"}, global_id=1)
+    records = [
+        # Уже в базе, но изменилась в новой версии реестра
+        {"global_id": 1, "ADDRESS": "Новая версия"},
+        {"global_id": 2, "ADDRESS": "Новый"},
+        # Дубликат внутри одной порции — остаётся первая запись
+        {"global_id": 2, "ADDRESS": "Дубликат"},
+        # Без global_id сравнивать не с чем — вставляются обе
+        {"ADDRESS": "Без идентификатора"},
+        {"global_id": None, "ADDRESS": "Без идентификатора"},
+    ]
+    file_path = write_registry(tmp_path / "registry.json", records)
+
+    stats = await load_raw_addresses(file_path)
+    assert stats == {"processed": 5, "inserted": 3, "updated": 1, "removed": 0}
+    assert await RawAddress.all().count() == 4
+    changed = await RawAddress.get(global_id=1)
+    assert changed.raw_data["ADDRESS"] == "Новая версия"
+    new = await RawAddress.get(global_id=2)
+    assert new.raw_data["ADDRESS"] == "Новый"
+    assert await RawAddress.filter(global_id__isnull=True).count() == 2
+
+    # Повторная загрузка того же файла не трогает записи с global_id,
+    # а записи без него заменяются новыми
+    stats = await load_raw_addresses(file_path)
+    assert stats == {"processed": 5, "inserted": 2, "updated": 0, "removed": 2}
+    assert await RawAddress.filter(global_id__isnull=False).count() == 2
+    assert await RawAddress.filter(global_id__isnull=True).count() == 2
+
+
+@pytest.mark.asyncio
+async def test_load_raw_addresses_prunes_dropped_records(tmp_path):
+    records = [{"global_id": i, "ADDRESS": f"Дом {i}"} for i in range(1, 4)]
+    await load_raw_addresses(write_registry(tmp_path / "v1.json", records))
+
+    # В новой версии реестра записи 2 нет
+    del records[1]
+    file_path = write_registry(tmp_path / "v2.json", records)
+    stats = await load_raw_addresses(file_path)
+    assert stats == {"processed": 2, "inserted": 0, "updated": 0, "removed": 1}
+    assert sorted(await RawAddress.all().values_list("global_id", flat=True)) == [1, 3]
+
+
+@pytest.mark.asyncio
+async def test_upsert_raw_addresses():
+    await RawAddress.create(raw_data={"global_id": 1, "ADDRESS": "А"}, global_id=1)
+    await RawAddress.create(raw_data={"global_id": 2, "ADDRESS": "Б"}, global_id=2)
+    # Строки с теми же global_id могли появиться и после проверки
+    # (параллельная загрузка) — конфликт разрешается в самом INSERT
+    written = await upsert_raw_addresses(
+        [
+            RawAddress(raw_data={"global_id": 1, "ADDRESS": "А"}, global_id=1),
+            RawAddress(raw_data={"global_id": 2, "ADDRESS": "Б2"}, global_id=2),
+            RawAddress(raw_data={"global_id": 3, "ADDRESS": "В"}, global_id=3),
+        ]
+    )
+    # Неизменённая запись не перезаписывается и не учитывается
+    assert sorted(written) == [2, 3]
+    assert await RawAddress.all().count() == 3
+    assert (await RawAddress.get(global_id=2)).raw_data["ADDRESS"] == "Б2"
@@ -1,11 +1,23 @@
+import asyncio
+import threading
+from datetime import timedelta
 from uuid import uuid4
 
 import jwt
 import pytest
+from fastapi import HTTPException
+from tortoise.timezone import now
 
-from src.auth.jwthandler import ALGORITHM, SECRET_KEY
-from src.crud.users import delete_user_by_id, get, get_user, pwd_context
-from src.database.models import User
+from src.auth.jwthandler import ALGORITHM, SECRET_KEY, principal_cache
+from src.auth.passwords import (
+    PasswordExecutor,
+    create_context,
+    password_executor,
+    pwd_context,
+)
+from src.crud.users import delete_user_by_id, get, get_user
+from src.database.models import RefreshToken, User
+from src.services.tokens import REFRESH_REUSE_GRACE_SECONDS
 
 
 @pytest.mark.asyncio
@@ -159,3 +171,259 @@ async def test_read_users_me_unauthorized(client):
     response = await client.get("/users/getuser")
     assert response.status_code == 401
     assert response.json() == {"detail": "Not authenticated"}
+
+
+async def login_cookies(client, username: str, password: str) -> dict:
+    response = await client.post(
+        "/login", data={"username": username, "password": password}
+    )
+    assert response.status_code == 200, "Ошибка входа"
+    # Куки secure — по http клиент их не отправит, передаём явно
+    return {
+        "Authorization": response.cookies.get("Authorization").strip('"'),
+        "Refresh": response.cookies.get("Refresh"),
+    }
+
+
+@pytest.mark.asyncio
+async def test_login_token_claims(client, admin):
+    cookies = await login_cookies(client, admin.username, "password_admin")
+    token = cookies["Authorization"].split(" ")[1]
+    decoded_token = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    assert decoded_token["uid"] == str(admin.id)
+    assert decoded_token["role"] == "Admin"
+    assert decoded_token["blocked"] is False
+    assert decoded_token["ver"] == 0
+
+
+@pytest.mark.asyncio
+async def test_current_user_cached(client, admin, user):
+    cookies = await login_cookies(client, admin.username, "password_admin")
+    hits = principal_cache.hits["token_state"]
+
+    response = await client.get("/admin/stats", cookies=cookies)
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    response = await client.get("/admin/stats", cookies=cookies)
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    assert principal_cache.hits["token_state"] == hits + 1
+
+    response = await client.get("/users/whoami", cookies=cookies)
+    assert response.json()["username"] == admin.username
+
+
+@pytest.mark.asyncio
+async def test_role_change_revokes_tokens(client, admin, user):
+    cookies = await login_cookies(client, admin.username, "password_admin")
+    user_cookies = await login_cookies(client, user.username, "password_user")
+    response = await client.get("/admin/stats", cookies=user_cookies)
+    assert response.status_code == 403
+
+    response = await client.post(
+        f"/admin/users/{user.id}/role", json={"role": "Admin"}, cookies=cookies
+    )
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+
+    # Старый токен с ролью User больше не принимается
+    response = await client.get("/admin/stats", cookies=user_cookies)
+    assert response.status_code == 401
+
+    user_cookies = await login_cookies(client, user.username, "password_user")
+    response = await client.get("/admin/stats", cookies=user_cookies)
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+
+
+@pytest.mark.asyncio
+async def test_block_revokes_tokens(client, admin, user):
+    cookies = await login_cookies(client, admin.username, "password_admin")
+    user_cookies = await login_cookies(client, user.username, "password_user")
+    response = await client.get("/users/getuser", cookies=user_cookies)
+    assert response.status_code == 200
+
+    response = await client.post(f"/admin/users/{user.id}/block", cookies=cookies)
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+
+    response = await client.get("/users/getuser", cookies=user_cookies)
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_password_executor_backpressure():
+    executor = PasswordExecutor(workers=1, max_pending=1)
+    release = threading.Event()
+    task = asyncio.create_task(executor.run(release.wait))
+    await asyncio.sleep(0.05)
+
+    # Пул занят: следующая операция отклоняется сразу, не вставая в очередь
+    with pytest.raises(HTTPException) as exc_info:
+        await executor.run(lambda: None)
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.headers["Retry-After"] == "1"
+    assert executor.metrics()["in_flight"] == 1
+
+    release.set()
+    assert await task is True
+    metrics = executor.metrics()
+    assert metrics["completed"] == 1
+    assert metrics["rejected"] == 1
+    assert metrics["in_flight"] == 0
+
+    # Упавшая операция освобождает место, но не считается выполненной
+    with pytest.raises(ValueError):
+        await executor.run(int, "not a number")
+    metrics = executor.metrics()
+    assert metrics["completed"] == 1
+    assert metrics["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_login_busy(client, user, monkeypatch):
+    monkeypatch.setattr(password_executor, "max_pending", 0)
+    response = await client.post(
+        "/login", data={"username": user.username, "password": "password_user"}
+    )
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_login_rehashes_outdated_password(client, user):
+    # Хеш с устаревшей стоимостью, как у пользователей до смены BCRYPT_ROUNDS
+    old_hash = create_context(bcrypt_rounds=4).hash("password_user")
+    await User.filter(id=user.id).update(password=old_hash)
+    assert pwd_context.needs_update(old_hash)
+
+    response = await client.post(
+        "/login", data={"username": user.username, "password": "password_user"}
+    )
+    assert response.status_code == 200
+
+    new_hash = (await User.get(id=user.id)).password
+    assert new_hash != old_hash
+    assert not pwd_context.needs_update(new_hash)
+    assert pwd_context.verify("password_user", new_hash)
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_rotation(client, user):
+    cookies = await login_cookies(client, user.username, "password_user")
+    stored = await RefreshToken.get(user_id=user.id)
+    # В БД только хеш, не само значение
+    assert stored.token_hash != cookies["Refresh"]
+
+    response = await client.post("/token/refresh", cookies=cookies)
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    new_refresh = response.cookies.get("Refresh")
+    assert new_refresh and new_refresh != cookies["Refresh"]
+    access = response.cookies.get("Authorization").strip('"')
+    response = await client.get("/users/getuser", cookies={"Authorization": access})
+    assert response.status_code == 200
+
+    # Новый токен из той же цепочки, старый помечен обменянным
+    tokens = await RefreshToken.filter(user_id=user.id).order_by("created_at")
+    assert len(tokens) == 2
+    assert tokens[0].used_at is not None
+    assert tokens[0].family_id == tokens[1].family_id
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_reuse_revokes_family(client, user):
+    cookies = await login_cookies(client, user.username, "password_user")
+    response = await client.post("/token/refresh", cookies=cookies)
+    new_refresh = response.cookies.get("Refresh")
+    await RefreshToken.filter(user_id=user.id, used_at__isnull=False).update(
+        used_at=now() - timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS + 1)
+    )
+
+    # Повторное предъявление обменянного токена отзывает всю цепочку
+    response = await client.post("/token/refresh", cookies=cookies)
+    assert response.status_code == 401
+    response = await client.post("/token/refresh", cookies={"Refresh": new_refresh})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_reuse_within_grace(client, user):
+    cookies = await login_cookies(client, user.username, "password_user")
+    response = await client.post("/token/refresh", cookies=cookies)
+    new_refresh = response.cookies.get("Refresh")
+
+    # Параллельный запрос со старым токеном сразу после обмена — гонка, не кража
+    response = await client.post("/token/refresh", cookies=cookies)
+    assert response.status_code == 401
+    response = await client.post("/token/refresh", cookies={"Refresh": new_refresh})
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    assert not await RefreshToken.filter(user_id=user.id, revoked=True).exists()
+
+
+@pytest.mark.asyncio
+async def test_expired_refresh_tokens_pruned(client, user, admin):
+    cookies = await login_cookies(client, user.username, "password_user")
+    await login_cookies(client, admin.username, "password_admin")
+    stored = await RefreshToken.get(user_id=user.id)
+    expired = now() - timedelta(seconds=1)
+    # Истёкшие токены этой цепочки и чужой цепочки
+    await RefreshToken.create(
+        user_id=user.id,
+        token_hash="1" * 64,
+        family_id=stored.family_id,
+        expires_at=expired,
+    )
+    await RefreshToken.create(
+        user_id=admin.id, token_hash="2" * 64, family_id=uuid4(), expires_at=expired
+    )
+
+    # Ротация чистит только свою цепочку; обменянный токен остаётся
+    # до истечения срока — для обнаружения повторного использования
+    response = await client.post("/token/refresh", cookies=cookies)
+    assert response.status_code == 200, f"Ошибка: {response.json()}"
+    assert await RefreshToken.filter(expires_at__lte=now()).count() == 1
+    assert await RefreshToken.filter(id=stored.id, used_at__isnull=False).exists()
+
+    # Вход удаляет истёкшие токены во всей таблице
+    await login_cookies(client, user.username, "password_user")
+    assert not await RefreshToken.filter(expires_at__lte=now()).exists()
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_invalid(client, user):
+    response = await client.post("/token/refresh")
+    assert response.status_code == 401
+    response = await client.post("/token/refresh", cookies={"Refresh": "unknown"})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_refresh_token_revoked_on_block(client, admin, user):
+    cookies = await login_cookies(client, admin.username, "password_admin")
+    user_cookies = await login_cookies(client, user.username, "password_user")
+    response = await client.post(f"/admin/users/{user.id}/block", cookies=cookies)
+    assert response.status_code == 200
+
+    response = await client.post("/token/refresh", cookies=user_cookies)
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_refresh_cookie_path(client, user):
+    response = await client.post(
+        "/login", data={"username": user.username, "password": "password_user"}
+    )
+    refresh = next(
+        cookie for cookie in response.cookies.jar if cookie.name == "Refresh"
+    )
+    assert refresh.path == "/token"
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_refresh_token(client, user):
+    cookies = await login_cookies(client, user.username, "password_user")
+    response = await client.post("/token/logout", cookies=cookies)
+    assert response.status_code == 200
+    assert 'Refresh=""' in response.headers["set-cookie"]
+    assert "Path=/token" in response.headers["set-cookie"]
+    # Выход только под /token, куда браузер отправляет Refresh-куку
+    response = await client.post("/logout", cookies=cookies)
+    assert response.status_code == 404
+
+    response = await client.post("/token/refresh", cookies=cookies)
+    assert response.status_code == 401
@@ -0,0 +1,93 @@
+import argparse
+import statistics
+import time
+
+from passlib.hash import argon2
+
+from src.auth.passwords import (
+    ARGON2_MEMORY_COST,
+    ARGON2_PARALLELISM,
+    PASSWORD_HASH_WORKERS,
+    create_context,
+)
+
+# Пароль для замеров: время bcrypt/argon2 от содержимого не зависит
+SAMPLE_PASSWORD = "calibration-password"
+
+
+def measure(context, samples: int) -> float:
+    """Медиана времени хеширования одного пароля в миллисекундах."""
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        context.hash(SAMPLE_PASSWORD)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate(costs, build_context, target_ms: float, samples: int) -> list:
+    """
+    Замеряет стоимости по возрастанию, пока время не превысит бюджет.
+    Возвращает [(cost, ms)] — последняя в бюджете стоимость и есть рекомендация.
+    """
+    results = []
+    for cost in costs:
+        elapsed = measure(build_context(cost), samples)
+        results.append((cost, elapsed))
+        if elapsed > target_ms:
+            break
+    return results
+
+
+def recommend(results: list, target_ms: float):
+    within = [cost for cost, elapsed in results if elapsed <= target_ms]
+    # Даже самая дешёвая стоимость не укладывается — берём её
+    return within[-1] if within else results[0][0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Подбор стоимости хеширования паролей под бюджет задержки входа"
+    )
+    parser.add_argument("--scheme", choices=["bcrypt", "argon2"], default="bcrypt")
+    parser.add_argument(
+        "--target-ms", type=float, default=250, help="бюджет на один хеш, мс"
+    )
+    parser.add_argument("--samples", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.scheme == "bcrypt":
+        setting = "BCRYPT_ROUNDS"
+        results = calibrate(
+            range(10, 17),
+            lambda rounds: create_context("bcrypt", bcrypt_rounds=rounds),
+            args.target_ms,
+            args.samples,
+        )
+    else:
+        if not argon2.has_backend():
+            raise SystemExit("Для argon2 установите пакет argon2-cffi")
+        setting = "ARGON2_TIME_COST"
+        print(
+            f"argon2: memory_cost={ARGON2_MEMORY_COST} КиБ, "
+            f"parallelism={ARGON2_PARALLELISM}"
+        )
+        results = calibrate(
+            range(1, 11),
+            lambda time_cost: create_context("argon2", argon2_time_cost=time_cost),
+            args.target_ms,
+            args.samples,
+        )
+
+    for cost, elapsed in results:
+        # Пропускная способность пула при такой стоимости
+        throughput = PASSWORD_HASH_WORKERS * 1000 / elapsed
+        print(f"{setting}={cost}: {elapsed:.0f} мс, до {throughput:.0f} входов/с")
+
+    cost = recommend(results, args.target_ms)
+    print(f"Рекомендация для бюджета {args.target_ms:.0f} мс: {setting}={cost}")
+    return cost
+
+
+if __name__ == "__main__":
+    main()
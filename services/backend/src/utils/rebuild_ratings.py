@@ -0,0 +1,20 @@
+from tortoise import run_async
+
+from src.crud.ratings import rebuild_house_ratings
+from src.helpers import db_connection
+from src.main import logger
+
+
+async def main():
+    """
+    Полностью пересобирает сводки рейтинга домов (house_ratings)
+    по опубликованным отзывам. Используется для первичного заполнения
+    и восстановления после ручных правок в БД.
+    """
+    async with db_connection():
+        total = await rebuild_house_ratings()
+        logger.info(f"Пересобрано сводок рейтинга: {total}")
+
+
+if __name__ == "__main__":
+    run_async(main())
@@ -1,134 +1,391 @@
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import aclosing
+from functools import partial
+
 from shapely.geometry import shape
 from tortoise import run_async
+from tortoise.timezone import now
 
-from src.database.models import AdmArea, District, House, RawAddress
+from src.database.models import AdmArea, District, House, RawAddress, point_coordinates
 from src.helpers import db_connection
 from src.main import logger
+from src.services.geo import clear_tile_cache
+from src.services.houses import invalidate_all_house_cache
+from src.services.reference import reference_data
 
+# Сколько сырых записей читается и обрабатывается за один проход
+BATCH_SIZE = 2000
 
-async def migrate_data():
-    async with db_connection():
+# Поля, которые перезаписываются при инкрементальном обновлении дома
+UPDATE_FIELDS = [
+    "obj_type",
+    "full_address",
+    "simple_address",
+    "adm_area_id",
+    "district_id",
+    "kad_n",
+    "kad_zu",
+    "geo_data",
+    "geodata_center",
+    "latitude",
+    "longitude",
+    "search_address",
+    "content_hash",
+    "updated_at",
+]
+
+# Число процессов для преобразования записей (геометрия — основная нагрузка CPU)
+MIGRATION_WORKERS = int(os.environ.get("HOUSE_MIGRATION_WORKERS", os.cpu_count() or 1))
+
+
+def transform_record(data: dict) -> dict | None:
+    """
+    Преобразует запись реестра в поля House.
+    Округ и район возвращаются именами — id подставляются позже.
+    Возвращает None, если запись некорректна и должна быть пропущена.
+    """
+    raw_unom = data.get("UNOM")
+
+    # Явное преобразование в строку
+    unom = str(raw_unom) if raw_unom is not None else None
+
+    # Пропускаем некорректные записи
+    if not all([unom, data.get("ADM_AREA"), data.get("DISTRICT")]):
+        return None
+
+    # Геоданные
+    geo_data = data.get("geoData")
+    geo_center = data.get("geodata_center")
+
+    record = {
+        "unom": unom,
+        "obj_type": data.get("OBJ_TYPE", ""),
+        "full_address": data.get("ADDRESS", ""),
+        "simple_address": data.get("SIMPLE_ADDRESS", ""),
+        "adm_area_name": data["ADM_AREA"],
+        "district_name": data["DISTRICT"],
+        # Кадастровые номера
+        "kad_n": data["KAD_N"][0]["KAD_N"] if data.get("KAD_N") else None,
+        "kad_zu": data["KAD_ZU"][0]["KAD_ZU"] if data.get("KAD_ZU") else None,
+        "geo_data": shape(geo_data).wkt if geo_data else None,
+        "geodata_center": shape(geo_center).wkt if geo_center else None,
+    }
+    record["latitude"], record["longitude"] = point_coordinates(
+        record["geodata_center"]
+    )
+    record["content_hash"] = content_hash(record)
+    return record
+
+
+def content_hash(record: dict) -> str:
+    """
+    Хеш содержимого дома: по нему инкрементальное обновление
+    определяет, изменилась ли запись в новой версии реестра.
+    """
+    payload = json.dumps(record, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def transform_batch(raw_batch: list) -> list:
+    """
+    Преобразует часть пачки; выполняется в процессе пула.
+    Для каждой записи возвращает (record, error): record=None без error —
+    запись пропущена, error — текст ошибки преобразования.
+    """
+    results = []
+    for data in raw_batch:
         try:
-            # Получаем все сырые адреса
-            raw_addresses = await RawAddress.all()
-            total = len(raw_addresses)
-            logger.info(f"Начинаю миграцию {total} записей")
-
-            # Собираем все существующие UNOM из БД
-            existing_unoms_db = set(
-                str(unom) for unom in await House.all().values_list("unom", flat=True)
-            )
-            logger.info(f"Найдено {len(existing_unoms_db)} существующих UNOM в БД")
-
-            # Собираем уникальные административные округа и районы
-            adm_area_names = set()
-            district_names = set()
-
-            for raw in raw_addresses:
-                data = raw.raw_data
-                if "ADM_AREA" in data:
-                    adm_area_names.add(data["ADM_AREA"])
-                if "DISTRICT" in data:
-                    district_names.add(data["DISTRICT"])
-
-            # Создаем административные округа
-            existing_areas = set(
-                await AdmArea.filter(name__in=adm_area_names).values_list(
-                    "name", flat=True
-                )
-            )
-            new_areas = adm_area_names - existing_areas
-            if new_areas:
-                await AdmArea.bulk_create([AdmArea(name=name) for name in new_areas])
-            adm_areas = {a.name: a for a in await AdmArea.all()}
-
-            # Создаем районы
-            existing_districts = set(
-                await District.filter(name__in=district_names).values_list(
-                    "name", flat=True
-                )
+            results.append((transform_record(data), None))
+        except Exception as e:
+            results.append((None, f"Ошибка обработки UNOM {data.get('UNOM')}: {e}"))
+    return results
+
+
+async def transform_in_pool(pool: ProcessPoolExecutor | None, raw_batch: list) -> list:
+    """
+    Преобразует пачку в процессе пула; без пула (workers <= 1) —
+    в текущем процессе.
+    """
+    if pool is None:
+        return transform_batch(raw_batch)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(pool, transform_batch, raw_batch)
+
+
+async def transform_batches(
+    pool: ProcessPoolExecutor | None, raw_batches, workers: int
+):
+    """
+    Отдаёт преобразованные пачки в порядке чтения, держая в пуле до
+    workers пачек одновременно: пока вставляется одна пачка, следующие
+    уже преобразуются, и все процессы пула заняты.
+    """
+    in_flight = deque()
+    try:
+        async for raw_batch in raw_batches:
+            in_flight.append(asyncio.ensure_future(transform_in_pool(pool, raw_batch)))
+            if len(in_flight) >= max(workers, 1):
+                yield await in_flight.popleft()
+        while in_flight:
+            yield await in_flight.popleft()
+    finally:
+        # Ошибка при вставке — незавершённые преобразования не нужны
+        for future in in_flight:
+            future.cancel()
+
+
+async def iter_raw_batches(batch_size: int = BATCH_SIZE):
+    """
+    Постранично (keyset по id) отдаёт raw_data из raw_addresses,
+    не загружая таблицу целиком.
+    """
+    last_id = None
+    while True:
+        query = RawAddress.all()
+        if last_id is not None:
+            query = query.filter(id__gt=last_id)
+        rows = await query.order_by("id").limit(batch_size).values("id", "raw_data")
+        if not rows:
+            return
+        yield [row["raw_data"] for row in rows]
+        last_id = rows[-1]["id"]
+
+
+async def resolve_names(model, cache: dict, names: set) -> dict:
+    """
+    Возвращает {name: id} для справочника (AdmArea/District),
+    создавая недостающие записи. cache переиспользуется между пачками.
+    """
+    missing = names - cache.keys()
+    if missing:
+        await model.bulk_create(
+            [model(name=name) for name in missing], ignore_conflicts=True
+        )
+        cache.update(await model.filter(name__in=missing).values_list("name", "id"))
+    return cache
+
+
+def build_house(record: dict, adm_areas: dict, districts: dict, **extra) -> House:
+    """Собирает House из преобразованной записи, подставляя id справочников."""
+    fields = dict(record)
+    adm_area_name = fields.pop("adm_area_name")
+    district_name = fields.pop("district_name")
+    # bulk_update подставляет атрибуты в SQL без to_db_value: сразу пишем EWKT
+    for name in ("geo_data", "geodata_center"):
+        fields[name] = House._meta.fields_map[name].to_db_value(fields[name], None)
+    house = House(
+        **fields,
+        **extra,
+        adm_area_id=adm_areas[adm_area_name],
+        district_id=districts[district_name],
+    )
+    # bulk_create/bulk_update не вызывают save(), заполняем поиск вручную
+    house.search_address = house.build_search_address()
+    return house
+
+
+async def migrate_batch(
+    transformed: list, adm_areas: dict, districts: dict, incremental: bool = False
+) -> dict:
+    """
+    Вставляет новые дома из одной преобразованной пачки (см. transform_batch).
+    В инкрементальном режиме также обновляет дома, у которых изменился
+    content_hash; неизменённые записи не трогаются.
+    """
+    stats = {
+        "processed": len(transformed),
+        "inserted": 0,
+        "updated": 0,
+        "skipped": 0,
+        "errors": 0,
+    }
+
+    records = {}
+    for record, error in transformed:
+        if error:
+            logger.error(error)
+            stats["errors"] += 1
+            continue
+        # Дубликаты внутри пачки отбрасываем, оставляя первую запись
+        if record is None or record["unom"] in records:
+            stats["skipped"] += 1
+            continue
+        records[record["unom"]] = record
+
+    # Сверка только для UNOM этой пачки (по уникальному индексу)
+    existing = {
+        unom: (house_id, house_hash)
+        for house_id, unom, house_hash in await House.filter(
+            unom__in=list(records)
+        ).values_list("id", "unom", "content_hash")
+    }
+    new_records = [r for unom, r in records.items() if unom not in existing]
+    changed_records = []
+    if incremental:
+        changed_records = [
+            r
+            for unom, r in records.items()
+            if unom in existing and existing[unom][1] != r["content_hash"]
+        ]
+    stats["skipped"] += len(records) - len(new_records) - len(changed_records)
+
+    touched = new_records + changed_records
+    if not touched:
+        return stats
+
+    await resolve_names(AdmArea, adm_areas, {r["adm_area_name"] for r in touched})
+    await resolve_names(District, districts, {r["district_name"] for r in touched})
+
+    if new_records:
+        houses = [build_house(r, adm_areas, districts) for r in new_records]
+        await House.bulk_create(houses, ignore_conflicts=True)
+        # Дома с тем же UNOM могла вставить параллельная миграция — конфликт
+        # пропускается молча, поэтому считаем по id только что созданных строк
+        stats["inserted"] = await House.filter(id__in=[h.id for h in houses]).count()
+        stats["skipped"] += len(houses) - stats["inserted"]
+
+    if changed_records:
+        updated_at = now()
+        houses = [
+            build_house(
+                r,
+                adm_areas,
+                districts,
+                id=existing[r["unom"]][0],
+                updated_at=updated_at,
             )
-            new_districts = district_names - existing_districts
-            if new_districts:
-                await District.bulk_create(
-                    [District(name=name) for name in new_districts]
-                )
-            districts = {d.name: d for d in await District.all()}
-
-            # Фильтруем и обрабатываем данные
-            houses_to_create = []
-            processed_unoms = set()
-
-            for i, raw in enumerate(raw_addresses, 1):
-                data = raw.raw_data
-                raw_unom = data.get("UNOM")
-
-                # Явное преобразование в строку
-                unom = str(raw_unom) if raw_unom is not None else None
-
-                # Пропускаем некорректные записи
-                if not all([unom, data.get("ADM_AREA"), data.get("DISTRICT")]):
-                    continue
-
-                # Проверка уникальности
-                if unom in existing_unoms_db or unom in processed_unoms:
-                    continue
-
-                try:
-                    # Геоданные
-                    geo_data = data.get("geoData")
-                    geo_center = data.get("geodata_center")
-                    geo_data_wkt = shape(geo_data).wkt if geo_data else None
-                    geodata_center_wkt = shape(geo_center).wkt if geo_center else None
-
-                    # Кадастровые номера
-                    kad_n = data["KAD_N"][0]["KAD_N"] if data.get("KAD_N") else None
-                    kad_zu = data["KAD_ZU"][0]["KAD_ZU"] if data.get("KAD_ZU") else None
-
-                    # Создаем объект дома
-                    house = House(
-                        unom=unom,
-                        obj_type=data.get("OBJ_TYPE", ""),
-                        full_address=data.get("ADDRESS", ""),
-                        simple_address=data.get("SIMPLE_ADDRESS", ""),
-                        adm_area=adm_areas[data["ADM_AREA"]],
-                        district=districts[data["DISTRICT"]],
-                        kad_n=kad_n,
-                        kad_zu=kad_zu,
-                        geo_data=geo_data_wkt,
-                        geodata_center=geodata_center_wkt,
-                    )
+            for r in changed_records
+        ]
+        await House.bulk_update(houses, fields=UPDATE_FIELDS)
+        stats["updated"] = len(houses)
 
-                    houses_to_create.append(house)
-                    processed_unoms.add(unom)
+    return stats
 
-                    if i % 1000 == 0:
-                        logger.info(f"Обработано {i} записей")
 
-                except Exception as e:
-                    logger.error(f"Ошибка обработки UNOM {unom}: {str(e)}")
-                    continue
+async def count_missing_houses(seen_unoms: set, batch_size: int = BATCH_SIZE) -> int:
+    """
+    Считает дома, которых нет в обработанной версии реестра.
+    Дома не удаляются (на них могут ссылаться отзывы) — только отчёт.
+    """
+    missing = 0
+    last_unom = None
+    while True:
+        query = House.all()
+        if last_unom is not None:
+            query = query.filter(unom__gt=last_unom)
+        unoms = (
+            await query.order_by("unom")
+            .limit(batch_size)
+            .values_list("unom", flat=True)
+        )
+        if not unoms:
+            return missing
+        absent = [unom for unom in unoms if unom not in seen_unoms]
+        if absent:
+            logger.info(f"Нет в реестре: {', '.join(absent[:10])}")
+        missing += len(absent)
+        last_unom = unoms[-1]
 
-            # Вставка данных
-            if houses_to_create:
-                try:
-                    await House.bulk_create(houses_to_create)
-                    logger.info(f"УСПЕХ: Добавлено {len(houses_to_create)} домов")
-                except Exception as e:
-                    logger.error(f"Ошибка массовой вставки: {str(e)}")
-            else:
-                logger.info("Нет новых данных для вставки")
 
+async def migrate_data(
+    batch_size: int = BATCH_SIZE,
+    workers: int = MIGRATION_WORKERS,
+    progress=None,
+    incremental: bool = False,
+) -> dict:
+    """
+    Переносит дома из raw_addresses в houses потоково: читает сырые
+    записи пачками, преобразует их в пуле процессов и вставляет каждую
+    пачку отдельно, так что память не зависит от размера реестра,
+    а CPU-нагрузка не блокирует event loop.
+    progress(totals), если передан, вызывается после каждой пачки.
+
+    incremental=True — режим обновления: изменённые дома (по content_hash)
+    обновляются, новые вставляются, отсутствующие в реестре попадают в отчёт.
+    """
+    async with db_connection():
+        totals = {
+            "processed": 0,
+            "inserted": 0,
+            "updated": 0,
+            "skipped": 0,
+            "errors": 0,
+        }
+        # Справочники из кэша приложения: resolve_names дописывает в них новые
+        adm_areas = await reference_data.name_map(AdmArea)
+        districts = await reference_data.name_map(District)
+        seen_unoms = set()
+        started = time.monotonic()
+        logger.info(
+            f"Начинаю миграцию пачками по {batch_size} записей, процессов: {workers}"
+        )
+
+        pool = None
+        if workers > 1:
+            # spawn: не форкаем процесс с работающим event loop и пулом соединений
+            pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        try:
+            batches = transform_batches(pool, iter_raw_batches(batch_size), workers)
+            async with aclosing(batches):
+                async for transformed in batches:
+                    if incremental:
+                        seen_unoms.update(r["unom"] for r, _ in transformed if r)
+                    stats = await migrate_batch(
+                        transformed, adm_areas, districts, incremental
+                    )
+                    for key, value in stats.items():
+                        totals[key] += value
+
+                    elapsed = time.monotonic() - started
+                    rate = totals["processed"] / elapsed if elapsed else 0
+                    logger.info(
+                        f"Обработано {totals['processed']} записей, "
+                        f"добавлено {totals['inserted']}, обновлено {totals['updated']} "
+                        f"домов ({rate:.0f} записей/с)"
+                    )
+                    if progress:
+                        progress(totals)
         except Exception as e:
             logger.error(f"Критическая ошибка: {str(e)}")
             raise
+        finally:
+            if pool is not None:
+                # shutdown ждёт процессы — не блокируем event loop
+                await asyncio.get_running_loop().run_in_executor(
+                    None, partial(pool.shutdown, cancel_futures=True)
+                )
+
+        if incremental:
+            totals["missing"] = await count_missing_houses(seen_unoms)
+            logger.info(f"Домов нет в новой версии реестра: {totals['missing']}")
+
+        if totals["inserted"] or totals["updated"]:
+            clear_tile_cache()
+            await invalidate_all_house_cache()
+            await reference_data.refresh()
+            logger.info(
+                f"УСПЕХ: Добавлено {totals['inserted']}, "
+                f"обновлено {totals['updated']} домов"
+            )
+        else:
+            logger.info("Нет новых данных для вставки")
+        return totals
 
 
-async def main():
+async def main(progress=None, incremental: bool = False):
     """
     Основная функция для инициализации базы данных и загрузки данных.
     """
-    await migrate_data()
+    return await migrate_data(progress=progress, incremental=incremental)
 
 
 if __name__ == "__main__":
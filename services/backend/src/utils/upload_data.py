@@ -1,8 +1,7 @@
 import asyncio
-import json
-from decimal import Decimal
 from pathlib import Path
 
+import ijson
 from tortoise import Tortoise, run_async
 
 from src.database.models import RawAddress
@@ -10,64 +9,174 @@ from src.helpers import db_connection
 from src.main import logger
 
 
-def convert_decimals(obj):
+class Utf8Reader:
     """
-    Рекурсивно преобразует все объекты Decimal в float.
+    Обёртка над текстовым файлом, отдающая байты в UTF-8:
+    ijson читает байты, а исходный файл реестра — в cp1251.
     """
-    if isinstance(obj, dict):
-        return {k: convert_decimals(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_decimals(item) for item in obj]
-    elif isinstance(obj, Decimal):
-        return float(obj)
-    return obj
+
+    def __init__(self, text_file):
+        self._file = text_file
+
+    def read(self, size: int = -1) -> bytes:
+        return self._file.read(size).encode("utf-8")
 
 
 def read_json_in_chunks(file_path: str, chunk_size: int = 1000):
     """
-    Генератор, который считывает JSON-файл (в формате массива объектов)
+    Генератор, который потоково разбирает JSON-файл (массив объектов)
     и возвращает данные порциями по chunk_size записей.
+
+    Файл не загружается в память целиком: ijson отдаёт объекты по одному,
+    числа сразу приходят как float (use_float), поэтому в памяти
+    одновременно находится только текущая порция.
     """
     logger.info("Начинаю обработку файла")
     with open(file_path, "r", encoding="cp1251") as f:
-        data = json.load(f)  # Загружаем весь файл
-        for i in range(0, len(data), chunk_size):
-            yield data[i : i + chunk_size]
+        stream = Utf8Reader(f)
+        chunk = []
+        for record in ijson.items(stream, "item", use_float=True):
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def extract_global_id(record: dict) -> int | None:
+    """
+    global_id записи реестра как целое число (или None, если его нет).
+    """
+    try:
+        return int(record["global_id"])
+    except (KeyError, TypeError, ValueError):
+        return None
 
 
-async def load_raw_addresses(file_path: str):
+async def upsert_raw_addresses(records: list) -> list:
+    """
+    Записывает записи (RawAddress) одним INSERT ... ON CONFLICT (global_id)
+    DO UPDATE: новая версия записи реестра заменяет старую, иначе
+    инкрементальное обновление домов не увидит изменений.
+    Неизменённые записи не перезаписываются. Возвращает global_id реально
+    вставленных и обновлённых строк.
+    """
+    connection = Tortoise.get_connection("default")
+    postgres = connection.capabilities.dialect == "postgres"
+    fields = RawAddress._meta.fields_map
+    params, values = [], []
+    for raw in records:
+        params += [
+            fields["id"].to_db_value(raw.id, raw),
+            fields["raw_data"].to_db_value(raw.raw_data, raw),
+            raw.global_id,
+        ]
+        if postgres:
+            n = len(params)
+            values.append(f"(${n - 2}::uuid, ${n - 1}::jsonb, ${n})")
+        else:
+            values.append("(?, ?, ?)")
+
+    _, rows = await connection.execute_query(
+        f"""
+        INSERT INTO "raw_addresses" ("id", "raw_data", "global_id")
+        VALUES {", ".join(values)}
+        ON CONFLICT ("global_id") DO UPDATE SET "raw_data" = EXCLUDED."raw_data"
+        WHERE "raw_addresses"."raw_data" IS DISTINCT FROM EXCLUDED."raw_data"
+        RETURNING "global_id"
+        """,
+        params,
+    )
+    return [row["global_id"] for row in rows]
+
+
+async def prune_raw_addresses(
+    seen_global_ids: set, loaded_ids: set, batch_size: int = 5000
+) -> int:
+    """
+    Удаляет сырые записи, которых нет в только что загруженной версии
+    реестра: global_id не встретился в файле, а записи без global_id
+    остались от прошлых загрузок. После этого raw_addresses совпадает
+    с текущей версией, и update_houses видит выбывшие дома.
+    Возвращает число удалённых строк.
+    """
+    removed = 0
+    last_id = None
+    while True:
+        query = RawAddress.all()
+        if last_id is not None:
+            query = query.filter(id__gt=last_id)
+        rows = (
+            await query.order_by("id").limit(batch_size).values_list("id", "global_id")
+        )
+        if not rows:
+            return removed
+        stale = [
+            raw_id
+            for raw_id, global_id in rows
+            if (global_id is None and raw_id not in loaded_ids)
+            or (global_id is not None and global_id not in seen_global_ids)
+        ]
+        if stale:
+            removed += await RawAddress.filter(id__in=stale).delete()
+        last_id = rows[-1][0]
+
+
+async def load_raw_addresses(file_path: str, progress=None):
     """
     Загружает данные из JSON-файла в таблицу RawAddress.
+
+    Записи сопоставляются по уникальному индексу global_id: новые
+    вставляются, изменившиеся в новой версии реестра обновляются
+    (upsert_raw_addresses); inserted и updated — число реально записанных
+    строк. Порции коммитятся по отдельности, поэтому прерванную загрузку
+    можно безопасно запустить повторно.
+    Когда файл прочитан целиком, записи, выбывшие из реестра, удаляются
+    (prune_raw_addresses); removed — их число.
+    progress(stats), если передан, вызывается после каждой порции.
     """
-    async with Tortoise.get_connection("default")._in_transaction():
-        # Загружаем все существующие global_id из базы данных
+    stats = {"processed": 0, "inserted": 0, "updated": 0, "removed": 0}
+    # Что есть в этой версии реестра: global_id и id записей без него
+    seen_global_ids = set()
+    loaded_ids = set()
+    async for chunk in async_iter(read_json_in_chunks(file_path)):
+        # Числа уже float (use_float), отдельная конвертация Decimal не нужна
+        records = {}
+        for record in chunk:
+            global_id = extract_global_id(record)
+            # Записи без global_id не с чем сравнивать — вставляем как есть
+            key = global_id if global_id is not None else object()
+            # Дубликаты внутри порции: один INSERT не может обновить строку дважды
+            records.setdefault(key, RawAddress(raw_data=record, global_id=global_id))
+
+        # Уже известные id — только чтобы отличить обновления от вставок
+        chunk_ids = [key for key in records if isinstance(key, int)]
         existing_ids = set(
-            record.get("global_id")
-            for record in await RawAddress.all().values_list("raw_data", flat=True)
-            if record.get("global_id") is not None
+            await RawAddress.filter(global_id__in=chunk_ids).values_list(
+                "global_id", flat=True
+            )
+        )
+        seen_global_ids.update(chunk_ids)
+        loaded_ids.update(raw.id for raw in records.values() if raw.global_id is None)
+        written = await upsert_raw_addresses(list(records.values()))
+        updated = sum(1 for global_id in written if global_id in existing_ids)
+
+        stats["processed"] += len(chunk)
+        stats["inserted"] += len(written) - updated
+        stats["updated"] += updated
+        logger.info(
+            f"Добавлено записей: {len(written) - updated}, обновлено: {updated}, "
+            f"всего добавлено {stats['inserted']}, обновлено {stats['updated']}"
         )
+        if progress:
+            progress(stats)
 
-        total_count = 0
-        async for chunk in async_iter(read_json_in_chunks(file_path)):
-            # Преобразуем каждую запись (например, заменяя Decimal на float)
-            records = [convert_decimals(record) for record in chunk]
-
-            # Фильтруем записи: оставляем только те, которых нет в базе
-            new_records = [
-                RawAddress(raw_data=record)
-                for record in records
-                if record.get("global_id") is None
-                or record.get("global_id") not in existing_ids
-            ]
-
-            if new_records:
-                await RawAddress.bulk_create(new_records)
-                total_count += len(new_records)
-                logger.info(
-                    f"Добавлено записей: {len(new_records)}, Всего: {total_count}"
-                )
-            else:
-                logger.info("Нет новых данных для вставки в chunck")
+    stats["removed"] = await prune_raw_addresses(seen_global_ids, loaded_ids)
+    logger.info(f"Удалено записей, выбывших из реестра: {stats['removed']}")
+    if progress:
+        progress(stats)
+    return stats
 
 
 async def async_iter(generator):
@@ -102,15 +211,17 @@ def get_latest_json_file() -> str | None:
     return str(files[0])
 
 
-async def main():
+async def main(progress=None):
     """
     Основная функция для инициализации базы данных и загрузки данных.
     """
     logger.info(f"Начинаю загружать данные в бд")
     async with db_connection():
         file_path = get_latest_json_file()
+        if not file_path:
+            raise FileNotFoundError("Нет JSON-файлов для загрузки в src/json/")
         logger.info(file_path)
-        await load_raw_addresses(file_path)
+        return await load_raw_addresses(file_path, progress)
 
 
 if __name__ == "__main__":